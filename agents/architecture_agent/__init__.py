@@ -1,6 +1,9 @@
 """Architecture Agent: produces architecture artifacts (README, diagrams, module interfaces)."""
 from __future__ import annotations
 
+from core.ai.semantic_cache import lookup_cached, store_cached
+from core.artifacts import write_artifact, write_artifact_stream
+
 from ..base import AgentBase, AgentResult
 
 
@@ -18,31 +21,59 @@ class ArchitectureAgent(AgentBase):
         optimization = inputs.get("optimization_goal", "balanced")
         modules = inputs.get("modules", [])
 
-        # Gather RAG context
-        rag_ctx = context.rag.query("architecture guidelines", top_k=3)
-        prompt = context.prompt_loader.compose(
+        # Gather RAG context concurrently with prompt composition: retrieval
+        # runs on the shared executor while the template is rendered
+        executor = getattr(context, "executor", None)
+        # With a reranker present, retrieve a wide candidate set and narrow it
+        # afterwards; fewer, denser chunks keep the prompt (and prefill) short
+        reranker = getattr(context, "reranker", None)
+        rag_top_k = 10 if reranker else 3
+        rag_future = executor.submit(context.rag.query, "architecture guidelines", top_k=rag_top_k) if executor else None
+        pending = context.prompt_loader.prepare_parts(
             "architecture_agent",
             constraints="Follow MISRA-like rules. Output must be in Markdown format.",
-            rag_context=rag_ctx,
             module=inputs,
             mcu=target_mcu,
             board_specs=f"Target: {target_mcu}, Optimization: {optimization}",
             optimization=optimization,
             modules=modules
         )
-        # Ask the LLM (Gemini wrapper)
-        generated = context.llm.generate(prompt)
-        # Persist artifact as .md file
-        from core.artifacts import write_artifact
-
-        path = write_artifact(
-            context,
-            self.agent_id,
-            "architecture",
-            generated,
-            metadata={"prompt_version": "v1", "mcu": target_mcu},
-            module_id=None,
-            prompt_version="v1",
-            extension="md"  # Use markdown extension
-        )
+        rag_ctx = rag_future.result() if rag_future else context.rag.query("architecture guidelines", top_k=rag_top_k)
+        if reranker:
+            rag_ctx = reranker.rerank(f"architecture guidelines for {target_mcu}", rag_ctx, top_k=2)
+        prompt = pending.with_rag(rag_ctx)
+        # Ask the LLM (Gemini wrapper) — via the semantic cache when available,
+        # so near-identical runs skip the LLM call entirely
+        meta = {"prompt_version": "v1", "mcu": target_mcu}
+        # Pass the parts pair: the exact layer keys on the full text while
+        # similarity matching only sees the request-specific dynamic portion
+        generated = lookup_cached(context, prompt)
+        if generated is not None:
+            # Cache hit: persist the cached text as a .md artifact directly
+            path = write_artifact(
+                context,
+                self.agent_id,
+                "architecture",
+                generated,
+                metadata=meta,
+                module_id=None,
+                prompt_version="v1",
+                extension="md"  # Use markdown extension
+            )
+        else:
+            # Cache miss: stream tokens straight into the artifact file so
+            # LLM decode overlaps with disk I/O instead of serializing
+            chunks = []
+            with write_artifact_stream(
+                context,
+                self.agent_id,
+                "architecture",
+                metadata=meta,
+                prompt_version="v1",
+                extension="md"
+            ) as (path, writer):
+                for chunk in context.llm.generate_stream(prompt):
+                    writer.write(chunk)
+                    chunks.append(chunk)
+            store_cached(context, prompt, "".join(chunks))
         return AgentResult(success=True, artifact_path=str(path), message="architecture generated")
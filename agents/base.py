@@ -2,15 +2,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Mapping
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AgentResult:
+    """Immutable agent outcome; slots keep per-instance allocation small."""
     success: bool
     artifact_path: str | None = None
     message: str = ""
-    metadata: Dict[str, Any] | None = None
+    metadata: Mapping[str, Any] | None = None
 
 
 class AgentBase:
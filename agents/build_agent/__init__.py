@@ -3,18 +3,68 @@ Generates comprehensive build log with compilation status and test results.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
+import mmap
+import os
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, List, Dict, Tuple, Optional
 import platform
 from datetime import datetime
 
+from functools import lru_cache
+
+from core.artifacts import write_json_artifact
+
 from ..base import AgentBase, AgentResult
 
 
+@lru_cache(maxsize=1)
+def _discover_compiler() -> str | None:
+    """Locate a C compiler on PATH once per process.
+
+    shutil.which stats every PATH entry, so the scan is memoized — repeated
+    BuildAgent.execute() calls return the cached result in O(1).
+    """
+    from shutil import which
+    for compiler in ["gcc", "clang", "cc"]:
+        if which(compiler):
+            logging.info(f"Found compiler: {compiler}")
+            return compiler
+    logging.warning("No C compiler found (gcc/clang)")
+    return None
+
+
+def _mmap_digest(path: str | Path) -> Optional[Tuple[int, str]]:
+    """Return (size, blake2b hex digest) of a file via mmap.
+
+    Mapping the file lets the hash read pages straight from the page cache
+    with no intermediate copy, and len(mm) gives the size without a second
+    stat() call. Returns None when the file cannot be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files cannot be mapped
+                return 0, hashlib.blake2b(b"", digest_size=16).hexdigest()
+            with mm:
+                return len(mm), hashlib.blake2b(mm, digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
 class BuildAgent(AgentBase):
+    # Shared base compiler flags, built once instead of per-invocation; the
+    # compile cache key derives from the same set (see _CACHE_FLAGS)
+    BASE_CFLAGS = ("-Wall", "-Wextra", "-std=c99", "-fPIC")
+
     def __init__(self):
         super().__init__(agent_id="build_agent")
 
@@ -22,7 +72,7 @@ class BuildAgent(AgentBase):
         context.mcp.check_run(self.agent_id)
 
         # Extract MCU target from context
-        target_mcu = context.target_mcu if hasattr(context, 'target_mcu') else inputs.get("target_mcu", "Unknown")
+        target_mcu = getattr(context, 'target_mcu', None) or inputs.get("target_mcu", "Unknown")
 
         # Collect all module_code artifacts
         modules = inputs.get("modules", [])
@@ -35,30 +85,39 @@ class BuildAgent(AgentBase):
         
         # Find all generated module files (.h and .c)
         module_dir = Path(context.run_output_dir) / "module_code"
-        if not module_dir.exists():
-            return AgentResult(
-                success=True,
-                artifact_path=None,
-                message="No module_code artifacts found; build skipped."
-            )
 
-        # Collect all .h and .c files by module (pairs are optional)
+        # Collect all .h and .c files by module (pairs are optional). One
+        # scandir per module directory replaces the exists()+stat() fan-out —
+        # DirEntry.stat() reuses the data fetched during the directory scan.
         module_artifacts = {}
         for mod in modules:
             mod_id = mod.get("id")
+            if not mod_id:
+                continue
             mod_subdir = module_dir / mod_id
-            if mod_subdir.exists():
-                header_file = mod_subdir / f"{mod_id}.h"
-                source_file = mod_subdir / f"{mod_id}.c"
-                entry = {}
-                if header_file.exists():
-                    entry["header"] = str(header_file)
-                    entry["header_size"] = header_file.stat().st_size
-                if source_file.exists():
-                    entry["source"] = str(source_file)
-                    entry["source_size"] = source_file.stat().st_size
-                if entry:
-                    module_artifacts[mod_id] = entry
+            try:
+                with os.scandir(mod_subdir) as it:
+                    entries = {e.name: e for e in it}
+            except FileNotFoundError:
+                continue
+            header_name = f"{mod_id}.h"
+            source_name = f"{mod_id}.c"
+            entry = {}
+            # Size and content hash come from one mmap pass per file; the hash
+            # doubles as the compile-cache key input and as provenance in the
+            # build log
+            if header_name in entries:
+                digest = _mmap_digest(mod_subdir / header_name)
+                if digest:
+                    entry["header"] = str(mod_subdir / header_name)
+                    entry["header_size"], entry["header_hash"] = digest
+            if source_name in entries:
+                digest = _mmap_digest(mod_subdir / source_name)
+                if digest:
+                    entry["source"] = str(mod_subdir / source_name)
+                    entry["source_size"], entry["source_hash"] = digest
+            if entry:
+                module_artifacts[mod_id] = entry
 
         if not module_artifacts:
             return AgentResult(
@@ -76,8 +135,6 @@ class BuildAgent(AgentBase):
         build_log = self._generate_build_log(module_artifacts, build_results, test_results)
         
         # Write build log as JSON artifact
-        from core.artifacts import write_json_artifact
-        
         log_path = write_json_artifact(
             context=context,
             agent_id=self.agent_id,
@@ -135,15 +192,11 @@ class BuildAgent(AgentBase):
             ]
         }
 
-    def _find_compiler(self) -> str | None:
-        """Find available C compiler (gcc/clang)."""
-        from shutil import which
-        for compiler in ["gcc", "clang", "cc"]:
-            if which(compiler):
-                logging.info(f"Found compiler: {compiler}")
-                return compiler
-        logging.warning("No C compiler found (gcc/clang)")
-        return None
+    def _find_compiler(self, force_rescan: bool = False) -> str | None:
+        """Find available C compiler (gcc/clang); result is cached per process."""
+        if force_rescan:
+            _discover_compiler.cache_clear()
+        return _discover_compiler()
 
     def _compile_modules(self, compiler: str, module_artifacts: Dict[str, Any], output_dir: Path) -> Dict[str, Any]:
         """Compile all modules and return compilation results."""
@@ -158,43 +211,94 @@ class BuildAgent(AgentBase):
             "warnings": []
         }
         
+        # ccache-style content-addressed cache: unchanged source+header+flags
+        # skip compilation entirely on repeated agent runs
+        cache_dir = Path(output_dir) / ".compile_cache"
+
+        # Collect per-module jobs; skip modules without sources up front and
+        # satisfy unchanged modules from the compile cache
+        jobs = []
+        include_dirs = set()
+        cache_keys: Dict[str, str] = {}
         for module_id, files in module_artifacts.items():
-            try:
-                sources = []
-                if "source" in files:
-                    sources.append(Path(files["source"]))
-                
-                if not sources:
-                    compilation_results["modules"][module_id] = {"status": "skipped", "reason": "no_source_files"}
+            if "source" not in files:
+                compilation_results["modules"][module_id] = {"status": "skipped", "reason": "no_source_files"}
+                continue
+            source = Path(files["source"])
+            output_path = build_dir / f"{module_id}.elf"
+            key = self._compile_cache_key(files)
+            if key:
+                cached_elf = cache_dir / key / output_path.name
+                if cached_elf.exists() and self._restore_cached(cached_elf, output_path):
+                    compilation_results["modules"][module_id] = {
+                        "status": "cached",
+                        "output": str(output_path),
+                        "size": output_path.stat().st_size
+                    }
                     continue
-                
-                # Get include directory
-                include_dir = Path(files.get("source", "")).parent
-                output_path = build_dir / f"{module_id}.elf"
-                
-                # Compile with strict flags
-                args = [
-                    compiler, "-Wall", "-Wextra", "-std=c99", "-fPIC",
-                    "-I", str(include_dir),
-                    "-o", str(output_path)
-                ] + [str(s) for s in sources]
-                
-                proc = subprocess.run(args, capture_output=True, text=True, timeout=30)
-                
-                if proc.returncode == 0:
+                cache_keys[module_id] = key
+            include_dirs.add(source.parent)
+            jobs.append((module_id, source, output_path))
+
+        if not jobs:
+            return compilation_results
+
+        # Phase 1: compile ALL sources to objects in a single gcc invocation,
+        # amortizing the driver startup cost across modules. Per-module
+        # diagnostics are recovered from stderr by filename prefix.
+        compile_args = [compiler, *self.BASE_CFLAGS]
+        for inc in sorted(include_dirs):
+            compile_args += ["-I", str(inc)]
+        compile_args += ["-c"] + [str(source) for _, source, _ in jobs]
+
+        try:
+            proc = self._run_compiler_streaming(compile_args, timeout=30 * len(jobs), cwd=build_dir)
+        except subprocess.TimeoutExpired:
+            compilation_results["status"] = "partial_success"
+            for module_id, _, _ in jobs:
+                compilation_results["modules"][module_id] = {"status": "timeout"}
+                compilation_results["errors"].append({"module": module_id, "error": "compilation timeout"})
+            return compilation_results
+
+        diagnostics = self._split_diagnostics_by_source(proc.stderr, [source for _, source, _ in jobs])
+        if proc.stdout:
+            compilation_results["warnings"].append({"module": "all", "output": proc.stdout})
+
+        # Phase 2: link each surviving object into its .elf concurrently
+        def _link_one(obj_path, output_path):
+            return subprocess.run([compiler, str(obj_path), "-o", str(output_path)], capture_output=True, text=True, timeout=30)
+
+        link_futures = {}
+        with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as ex:
+            for module_id, source, output_path in jobs:
+                obj_path = build_dir / (source.stem + ".o")
+                if obj_path.exists():
+                    link_futures[module_id] = ex.submit(_link_one, obj_path, output_path)
+
+        for module_id, source, output_path in jobs:
+            module_diag = diagnostics.get(source.name, "")
+            future = link_futures.get(module_id)
+            if future is None:
+                compilation_results["status"] = "partial_success"
+                compilation_results["modules"][module_id] = {"status": "failed", "error": module_diag or proc.stderr}
+                compilation_results["errors"].append({"module": module_id, "error": module_diag or proc.stderr})
+                continue
+            try:
+                link_proc = future.result()
+                if link_proc.returncode == 0:
                     compilation_results["modules"][module_id] = {
                         "status": "success",
                         "output": str(output_path),
                         "size": output_path.stat().st_size if output_path.exists() else 0
                     }
+                    if module_diag:
+                        compilation_results["warnings"].append({"module": module_id, "output": module_diag})
+                    if module_id in cache_keys and output_path.exists():
+                        self._store_cached(cache_dir / cache_keys[module_id], output_path)
                 else:
                     compilation_results["status"] = "partial_success"
-                    compilation_results["modules"][module_id] = {"status": "failed", "error": proc.stderr}
-                    compilation_results["errors"].append({"module": module_id, "error": proc.stderr})
-                
-                if proc.stdout:
-                    compilation_results["warnings"].append({"module": module_id, "output": proc.stdout})
-                    
+                    compilation_results["modules"][module_id] = {"status": "failed", "error": link_proc.stderr}
+                    compilation_results["errors"].append({"module": module_id, "error": link_proc.stderr})
             except subprocess.TimeoutExpired:
                 compilation_results["status"] = "partial_success"
                 compilation_results["modules"][module_id] = {"status": "timeout"}
@@ -203,9 +307,116 @@ class BuildAgent(AgentBase):
                 compilation_results["status"] = "partial_success"
                 compilation_results["modules"][module_id] = {"status": "error", "error": str(e)}
                 compilation_results["errors"].append({"module": module_id, "error": str(e)})
-        
+
         return compilation_results
 
+    @staticmethod
+    def _run_compiler_streaming(args: List[str], timeout: int, cwd: Path) -> subprocess.CompletedProcess:
+        """Run the compiler, draining stdout/stderr concurrently.
+
+        The reader threads keep the pipes from filling (and the compiler from
+        blocking) on large diagnostic volumes. No early abort: the invocation
+        batches every module's source, so terminating on the first fatal
+        diagnostic would also kill compilation of the unaffected siblings —
+        gcc itself skips past a fatal unit and continues with the rest.
+        """
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, cwd=cwd)
+        stderr_lines: List[str] = []
+        stdout_chunks: List[str] = []
+
+        def _drain_stderr():
+            for line in proc.stderr:
+                stderr_lines.append(line)
+
+        def _drain_stdout():
+            stdout_chunks.append(proc.stdout.read())
+
+        readers = [threading.Thread(target=_drain_stderr), threading.Thread(target=_drain_stdout)]
+        for t in readers:
+            t.start()
+        try:
+            returncode = proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            for t in readers:
+                t.join()
+        return subprocess.CompletedProcess(args, returncode, stdout="".join(stdout_chunks), stderr="".join(stderr_lines))
+
+    # Compile flags participating in the cache key; path-dependent args (-I, -o) excluded
+    _CACHE_FLAGS = " ".join(BASE_CFLAGS).encode("ascii")
+
+    @classmethod
+    def _compile_cache_key(cls, files: Dict[str, Any]) -> str | None:
+        """Hash of source + header content hashes + flags identifying a compiled module.
+
+        Reuses the mmap digests computed during artifact discovery when
+        present, so the sources are not read a second time.
+        """
+        h = hashlib.blake2b(cls._CACHE_FLAGS)
+        for role in ("source", "header"):
+            if role not in files:
+                continue
+            content_hash = files.get(f"{role}_hash")
+            if content_hash is None:
+                digest = _mmap_digest(files[role])
+                if digest is None:
+                    return None
+                content_hash = digest[1]
+            h.update(content_hash.encode("ascii"))
+        return h.hexdigest()
+
+    @staticmethod
+    def _restore_cached(cached_elf: Path, output_path: Path) -> bool:
+        """Hardlink (or copy) a cached .elf into the build dir."""
+        try:
+            output_path.unlink(missing_ok=True)
+            try:
+                os.link(cached_elf, output_path)
+            except OSError:
+                shutil.copy(cached_elf, output_path)
+            return True
+        except OSError as exc:
+            logging.warning(f"Compile cache restore failed for {cached_elf}: {exc}")
+            return False
+
+    @staticmethod
+    def _store_cached(cache_entry_dir: Path, output_path: Path) -> None:
+        """Store a freshly built .elf under its content-addressed cache entry."""
+        try:
+            cache_entry_dir.mkdir(parents=True, exist_ok=True)
+            target = cache_entry_dir / output_path.name
+            if not target.exists():
+                try:
+                    os.link(output_path, target)
+                except OSError:
+                    shutil.copy(output_path, target)
+        except OSError as exc:
+            logging.warning(f"Compile cache store failed for {output_path}: {exc}")
+
+    @staticmethod
+    def _split_diagnostics_by_source(stderr: str, sources: List[Path]) -> Dict[str, str]:
+        """Attribute gcc diagnostics from a batched invocation to their source files.
+
+        gcc prefixes each diagnostic with the source path; continuation lines
+        (carets, notes) are attached to the most recent matching file.
+        """
+        by_name: Dict[str, List[str]] = {s.name: [] for s in sources}
+        current = None
+        for line in stderr.splitlines():
+            # Anchor on the leading file:line: prefix and compare the exact
+            # basename — substring matching would let uart.c claim lines
+            # belonging to e.g. my_uart.c (or dma.c those of uart_dma.c)
+            prefix = line.split(":", 1)[0]
+            base = prefix.replace("\\", "/").rsplit("/", 1)[-1].strip()
+            if base in by_name:
+                current = base
+            if current is not None:
+                by_name[current].append(line)
+        return {name: "\n".join(lines) for name, lines in by_name.items() if lines}
+
     def _run_tests(self, output_dir: Path, module_artifacts: Dict[str, Any], compiler: str | None) -> Dict[str, Any] | None:
         """Compile and run unit tests if test files exist."""
         test_dir = output_dir / "tests"
@@ -221,16 +432,27 @@ class BuildAgent(AgentBase):
                 "reason": "no_compiler_found"
             }
 
-        # Collect test source files
-        test_sources = [p for p in test_dir.rglob("*") if p.is_file() and not p.name.endswith(".meta.json")]
+        # Collect test source files — os.walk filters on plain strings, so no
+        # per-entry Path construction or extra is_file() stat
+        test_sources = [
+            Path(root) / f
+            for root, _, files in os.walk(test_dir)
+            for f in files
+            if not f.endswith(".meta.json")
+        ]
         if not test_sources:
             return None
 
-        # Compile test sources into executables
+        # Compile test sources into executables; one pass over the artifacts
+        # gathers both the sources and their include dirs
         build_dir.mkdir(exist_ok=True)
-        module_sources = [Path(v["source"]) for v in module_artifacts.values() if "source" in v]
-        include_dirs = {Path(v["source"]).parent for v in module_artifacts.values() if "source" in v}
-        include_dirs.add(test_dir)
+        module_sources: List[Path] = []
+        include_dirs = {test_dir}
+        for v in module_artifacts.values():
+            if "source" in v:
+                src = Path(v["source"])
+                module_sources.append(src)
+                include_dirs.add(src.parent)
 
         test_executables: List[Path] = []
         test_results = {
@@ -247,14 +469,16 @@ class BuildAgent(AgentBase):
             }
         }
 
+        # Build per-test compile jobs; each test is compiled and, on success,
+        # executed immediately in the same async task, so execution of early
+        # finishers overlaps with compilation of the rest.
+        compile_jobs = []
         for test_src in test_sources:
             module_name = test_src.stem
             exe_suffix = ".exe" if platform.system().lower().startswith("win") else ""
             output_path = build_dir / f"{module_name}_test{exe_suffix}"
 
-            args = [
-                compiler, "-Wall", "-Wextra", "-std=c99", "-fPIC",
-            ]
+            args = [compiler, *self.BASE_CFLAGS]
             for inc in sorted(include_dirs):
                 args += ["-I", str(inc)]
 
@@ -263,67 +487,112 @@ class BuildAgent(AgentBase):
                 args += ["-x", "c"]
 
             args += [str(test_src)] + [str(s) for s in module_sources] + ["-o", str(output_path)]
+            compile_jobs.append((module_name, args, output_path))
+
+        async def _exec(args):
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+            return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+        async def _compile_and_run(module_name, args, output_path):
+            """Compile one test and run it as soon as its compile finishes."""
+            returncode, stdout, stderr = await _exec(args)
+            if returncode != 0:
+                return ("compile_failed", module_name, output_path, stdout, stderr)
+            if not output_path.exists():
+                return ("missing", module_name, output_path, stdout, stderr)
+            run_name = output_path.stem.replace("_test", "").replace("test_", "")
+            try:
+                returncode, stdout, stderr = await _exec([str(output_path)])
+            except asyncio.TimeoutError:
+                return ("run_timeout", run_name, output_path, "", "")
+            except Exception as e:
+                return ("run_error", run_name, output_path, "", str(e))
+            return ("ran", run_name, output_path, stdout, stderr) if returncode == 0 else ("run_failed", run_name, output_path, stdout, stderr)
+
+        async def _run_all():
+            return await asyncio.gather(
+                *(_compile_and_run(name, args, path) for name, args, path in compile_jobs),
+                return_exceptions=True,
+            )
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Sync path (CLI): no loop on this thread
+            outcomes = asyncio.run(_run_all())
+        else:
+            # Called from an async host (e.g. the backend's background task):
+            # asyncio.run() refuses inside a running loop, so run the batch on
+            # a fresh loop in a worker thread and block on it
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                outcomes = pool.submit(asyncio.run, _run_all()).result()
 
-            proc = subprocess.run(args, capture_output=True, text=True, timeout=30)
-            if proc.returncode != 0:
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                test_results["all_passed"] = False
+                test_results["total_failed"] += 1
+                test_results["compilation"]["status"] = "partial_success"
+                test_results["compilation"]["errors"].append({"test": "unknown", "error": str(outcome)})
+                continue
+            kind, module_name, output_path, stdout, stderr = outcome
+            if kind == "compile_failed":
                 test_results["compilation"]["status"] = "partial_success"
                 test_results["compilation"]["errors"].append({
                     "test": module_name,
-                    "error": proc.stderr or proc.stdout
+                    "error": stderr or stdout
                 })
                 test_results["test_modules"][module_name] = {
                     "executable": str(output_path),
                     "passed": False,
                     "error": "test compilation failed",
-                    "compile_output": (proc.stdout or "") + (proc.stderr or "")
+                    "compile_output": (stdout or "") + (stderr or "")
                 }
                 test_results["all_passed"] = False
                 test_results["total_failed"] += 1
+            elif kind == "missing":
                 continue
-
-            if output_path.exists():
-                test_executables.append(output_path)
-        
-        for test_exe in test_executables:
-            module_name = test_exe.stem.replace("_test", "").replace("test_", "")
-            try:
-                proc = subprocess.run(
-                    [str(test_exe)],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                passed = proc.returncode == 0
-                test_results["test_modules"][module_name] = {
-                    "executable": str(test_exe),
-                    "passed": passed,
-                    "output": proc.stdout + proc.stderr
-                }
-                
-                if passed:
-                    test_results["total_passed"] += 1
-                else:
-                    test_results["all_passed"] = False
-                    test_results["total_failed"] += 1
-                    
-            except subprocess.TimeoutExpired:
+            elif kind == "run_timeout":
                 test_results["all_passed"] = False
                 test_results["total_failed"] += 1
                 test_results["test_modules"][module_name] = {
-                    "executable": str(test_exe),
+                    "executable": str(output_path),
                     "passed": False,
                     "error": "test timeout"
                 }
-            except Exception as e:
+                test_executables.append(output_path)
+            elif kind == "run_error":
                 test_results["all_passed"] = False
                 test_results["total_failed"] += 1
                 test_results["test_modules"][module_name] = {
-                    "executable": str(test_exe),
+                    "executable": str(output_path),
                     "passed": False,
-                    "error": str(e)
+                    "error": stderr
                 }
-        
+                test_executables.append(output_path)
+            else:
+                passed = kind == "ran"
+                test_results["test_modules"][module_name] = {
+                    "executable": str(output_path),
+                    "passed": passed,
+                    "output": stdout + stderr
+                }
+                if passed:
+                    test_results["total_passed"] += 1
+                else:
+                    test_results["all_passed"] = False
+                    test_results["total_failed"] += 1
+                test_executables.append(output_path)
+
         test_results["summary"] = {
             "total_tests": len(test_executables),
             "passed": test_results["total_passed"],
@@ -5,10 +5,103 @@ from __future__ import annotations
 
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Any, Tuple
 
+from core.ai.llm_cache import disk_cached_generate
+from core.artifacts import write_modular_code, write_single_file_code
+
 from ..base import AgentBase, AgentResult
 
+try:  # optional fast JSON decoder
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compiled once at import; _extract_modular_code runs once per generated module
+_CODE_BLOCK_RE = re.compile(r'```(?:c|cpp|arduino|ino)?\s*\n([\s\S]*?)```', re.DOTALL)
+
+# Prefixes that mark the first function definition in the fallback splitter
+_FUNC_PREFIXES = ("int ", "void ", "uint", "float ")
+
+
+# One alternation scan classifies the MCU family in C instead of up to ~15
+# Python-level substring checks; group order preserves family precedence for
+# matches at the same position
+_MCU_RE = re.compile(
+    r'(?P<arduino>arduino|uno|mega|nano|atmega)'
+    r'|(?P<esp>esp32|esp8266)'
+    r'|(?P<stm>stm32|stm)'
+    r'|(?P<nordic>nrf5[12]|nordic)'
+    r'|(?P<pic>pic32|pic)'
+    r'|(?P<pico>pico|rp2040)'
+)
+
+_MCU_FORMATS = {
+    # Arduino boards - single .ino file
+    "arduino": MappingProxyType({
+        "is_single_file": True,
+        "extension": "ino",
+        "framework": "arduino",
+        "comment": "Arduino framework with setup()/loop()"
+    }),
+    # ESP32 - can use Arduino framework or ESP-IDF
+    "esp": MappingProxyType({
+        "is_single_file": True,
+        "extension": "ino",  # Default to Arduino framework for ESP32
+        "framework": "arduino-esp32",
+        "comment": "ESP32 with Arduino framework"
+    }),
+    # STM32 - modular HAL-based code
+    "stm": MappingProxyType({
+        "is_single_file": False,
+        "extension": "c",
+        "framework": "hal",
+        "comment": "STM32 HAL with modular .h/.c files"
+    }),
+    # Nordic nRF52 - modular Nordic SDK
+    "nordic": MappingProxyType({
+        "is_single_file": False,
+        "extension": "c",
+        "framework": "nordic-sdk",
+        "comment": "Nordic SDK with modular files"
+    }),
+    # PIC32 - modular Harmony framework
+    "pic": MappingProxyType({
+        "is_single_file": False,
+        "extension": "c",
+        "framework": "harmony",
+        "comment": "PIC32 Harmony framework"
+    }),
+    # Raspberry Pi Pico - could be Arduino or Pico SDK
+    "pico": MappingProxyType({
+        "is_single_file": True,
+        "extension": "ino",
+        "framework": "arduino-pico",
+        "comment": "RP2040 with Arduino framework"
+    }),
+    # Default: modular C code
+    "default": MappingProxyType({
+        "is_single_file": False,
+        "extension": "c",
+        "framework": "generic",
+        "comment": "Generic C with modular files"
+    }),
+}
+
+
+@lru_cache(maxsize=64)
+def _classify_mcu(mcu_lower: str) -> MappingProxyType:
+    """Classify an MCU name into its code format; memoized per MCU string.
+
+    N modules targeting the same MCU hit the cache instead of re-running the
+    scan. The read-only proxies keep the shared entries immutable.
+    """
+    m = _MCU_RE.search(mcu_lower)
+    return _MCU_FORMATS[m.lastgroup if m else "default"]
+
 
 class CodeAgent(AgentBase):
     def __init__(self, module_name: str):
@@ -19,89 +112,65 @@ class CodeAgent(AgentBase):
     def determine_mcu_format(mcu_name: str) -> dict:
         """
         Determine code format based on MCU/board name.
-        
+
         Returns dict with:
         - is_single_file: bool (True for Arduino, False for modular)
         - extension: str (ino, cpp, c)
         - framework: str (arduino, hal, esp-idf, nordic, harmony)
         """
-        mcu_lower = mcu_name.lower()
-        
-        # Arduino boards - single .ino file
-        if any(x in mcu_lower for x in ["arduino", "uno", "mega", "nano", "atmega"]):
-            return {
-                "is_single_file": True,
-                "extension": "ino",
-                "framework": "arduino",
-                "comment": "Arduino framework with setup()/loop()"
-            }
-        
-        # ESP32 - can use Arduino framework or ESP-IDF
-        elif "esp32" in mcu_lower or "esp8266" in mcu_lower:
-            return {
-                "is_single_file": True,
-                "extension": "ino",  # Default to Arduino framework for ESP32
-                "framework": "arduino-esp32",
-                "comment": "ESP32 with Arduino framework"
-            }
-        
-        # STM32 - modular HAL-based code
-        elif "stm32" in mcu_lower or "stm" in mcu_lower:
-            return {
-                "is_single_file": False,
-                "extension": "c",
-                "framework": "hal",
-                "comment": "STM32 HAL with modular .h/.c files"
-            }
-        
-        # Nordic nRF52 - modular Nordic SDK
-        elif "nrf52" in mcu_lower or "nrf51" in mcu_lower or "nordic" in mcu_lower:
-            return {
-                "is_single_file": False,
-                "extension": "c",
-                "framework": "nordic-sdk",
-                "comment": "Nordic SDK with modular files"
-            }
-        
-        # PIC32 - modular Harmony framework
-        elif "pic32" in mcu_lower or "pic" in mcu_lower:
-            return {
-                "is_single_file": False,
-                "extension": "c",
-                "framework": "harmony",
-                "comment": "PIC32 Harmony framework"
-            }
-        
-        # Raspberry Pi Pico - could be Arduino or Pico SDK
-        elif "pico" in mcu_lower or "rp2040" in mcu_lower:
-            return {
-                "is_single_file": True,
-                "extension": "ino",
-                "framework": "arduino-pico",
-                "comment": "RP2040 with Arduino framework"
-            }
-        
-        # Default: modular C code
-        else:
-            return {
-                "is_single_file": False,
-                "extension": "c",
-                "framework": "generic",
-                "comment": "Generic C with modular files"
-            }
+        return _classify_mcu(mcu_name.lower())
 
     def execute(self, context: Any, inputs: dict) -> AgentResult:
         """Generate MCU-specific code. Format determined by hardware target."""
+        prompt, gen_info = self._compose_prompt(context, inputs)
+
+        # Generate code — through the persistent disk cache when enabled
+        generated_raw = disk_cached_generate(context.llm, prompt)
+
+        return self._persist(context, inputs, gen_info, generated_raw)
+
+    @classmethod
+    def execute_batch(cls, context: Any, module_inputs: list) -> list:
+        """Generate code for several modules through one batched LLM call.
+
+        Prompt composition and artifact persistence stay per-module; only the
+        N generate round-trips collapse into a single generate_batch, which
+        network-bound backends overlap.
+        """
+        agents = [cls(mi.get("id")) for mi in module_inputs]
+        composed = [agent._compose_prompt(context, mi) for agent, mi in zip(agents, module_inputs)]
+        outputs = context.llm.generate_batch([prompt for prompt, _ in composed])
+        return [
+            agent._persist(context, mi, gen_info, generated_raw)
+            for agent, mi, (_, gen_info), generated_raw in zip(agents, module_inputs, composed, outputs)
+        ]
+
+    @classmethod
+    def execute_many(cls, context: Any, module_inputs: list, max_workers: int = 8) -> list:
+        """Run one CodeAgent per module concurrently.
+
+        Each execute is dominated by the LLM round-trip, which releases the
+        GIL, so wall-clock drops from the sum of per-module latencies to
+        roughly the slowest one. MCP audit appends are lock-serialized.
+        """
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(module_inputs) or 1)) as ex:
+            return list(ex.map(lambda mi: cls(mi.get("id")).execute(context, mi), module_inputs))
+
+    def _compose_prompt(self, context: Any, inputs: dict) -> Tuple[str, dict]:
+        """Authorize, gather RAG context, and compose this module's prompt.
+
+        Returns the prompt plus the hardware/format decisions _persist needs.
+        """
         # MCP authorization
         context.mcp.check_run(self.agent_id)
         context.mcp.check_write(self.agent_id, f"module_code:{self.module_name}")
 
-        # Extract MCU and board info
-        target_mcu = context.target_mcu if hasattr(context, 'target_mcu') else inputs.get("target_mcu", "Unknown")
-        optimization = context.optimization_goal if hasattr(context, 'optimization_goal') else inputs.get("optimization_goal", "balanced")
-        all_modules = inputs.get("all_modules") or context.modules if hasattr(context, 'modules') else inputs.get("modules", [])
-        project_name = inputs.get("project_name", "firmware")
-        
+        # Extract MCU and board info — getattr with a default skips the
+        # AttributeError machinery hasattr would exercise on thin contexts
+        target_mcu = getattr(context, 'target_mcu', None) or inputs.get("target_mcu", "Unknown")
+        optimization = getattr(context, 'optimization_goal', None) or inputs.get("optimization_goal", "balanced")
+        all_modules = inputs.get("all_modules") or getattr(context, 'modules', None) or inputs.get("modules", [])
+
         # DETERMINE FORMAT BASED ON HARDWARE
         mcu_format = self.determine_mcu_format(target_mcu)
         is_single_file = mcu_format["is_single_file"]
@@ -118,7 +187,7 @@ class CodeAgent(AgentBase):
             format_instruction = f"Generate ONE {extension.upper()} file with ALL hardware modules integrated. Framework: {framework}."
         else:
             format_instruction = f"Generate modular .h/.c files. Framework: {framework}."
-        
+
         # Compose prompt with hardware-specific instructions
         prompt = context.prompt_loader.compose(
             "code_agent",
@@ -130,18 +199,32 @@ class CodeAgent(AgentBase):
             optimization=optimization,
             modules=all_modules
         )
+        gen_info = {
+            "target_mcu": target_mcu,
+            "is_single_file": is_single_file,
+            "extension": extension,
+            "framework": framework,
+            "all_modules": all_modules,
+            "rag_ctx": rag_ctx,
+        }
+        return prompt, gen_info
+
+    def _persist(self, context: Any, inputs: dict, gen_info: dict, generated_raw: str) -> AgentResult:
+        """Extract and write the generated code for one module."""
+        target_mcu = gen_info["target_mcu"]
+        is_single_file = gen_info["is_single_file"]
+        extension = gen_info["extension"]
+        framework = gen_info["framework"]
+        all_modules = gen_info["all_modules"]
+        rag_ctx = gen_info["rag_ctx"]
+        project_name = inputs.get("project_name", "firmware")
 
-        # Generate code
-        generated_raw = context.llm.generate(prompt)
-        
         # Handle based on MCU format
         if is_single_file:
             # Single-file firmware (Arduino, ESP32-Arduino, etc.)
             header_code, source_code = self._extract_modular_code(generated_raw)
             code_content = source_code if source_code else (header_code if header_code else generated_raw)
             
-            from core.artifacts import write_single_file_code
-            
             result_path = write_single_file_code(
                 context=context,
                 agent_id=self.agent_id,
@@ -173,8 +256,6 @@ class CodeAgent(AgentBase):
             # Modular code (STM32, nRF52, PIC32, etc.)
             header_code, source_code = self._extract_modular_code(generated_raw)
             
-            from core.artifacts import write_modular_code
-
             result = write_modular_code(
                 context=context,
                 agent_id=self.agent_id,
@@ -184,7 +265,7 @@ class CodeAgent(AgentBase):
                 metadata={
                     "prompt_version": "v1",
                     "framework": framework,
-                    "rag_context_used": len(rag_ctx) > 0
+                    "rag_context_used": bool(rag_ctx)
                 },
                 prompt_version="v1"
             )
@@ -213,45 +294,53 @@ class CodeAgent(AgentBase):
         3. Marked sections: ###HEADER### ... ###SOURCE### ...
         4. Plain text fallback
         """
-        import re
-        
         # Step 1: Strip markdown code blocks
         content = generated_raw
-        
-        # Remove markdown code fences (```c ... ```)
-        code_block_pattern = r'```(?:c|cpp|arduino|ino)?\s*\n([\s\S]*?)```'
-        matches = re.findall(code_block_pattern, content, re.DOTALL)
-        if matches:
-            # Use the first/largest code block
-            content = max(matches, key=len) if matches else content
-        
+
+        # Remove markdown code fences (```c ... ```) — plain-C output has no
+        # backticks, so skip the regex entirely in that common case
+        if '```' in content:
+            matches = _CODE_BLOCK_RE.findall(content)
+            # Use the largest code block; single-match outputs (the norm)
+            # skip the comparison loop entirely
+            if len(matches) == 1:
+                content = matches[0]
+            elif matches:
+                best = matches[0]
+                best_len = len(best)
+                for m in matches[1:]:
+                    ml = len(m)
+                    if ml > best_len:
+                        best, best_len = m, ml
+                content = best
+
         # Step 2: Try JSON parsing (handles {"source": "...", "header": "..."})
-        try:
-            # Remove backticks if still present
-            json_content = content.strip('`').strip()
-            data = json.loads(json_content)
-            
-            # Check for "source" key (Arduino single file)
-            if "source" in data and "header" not in data:
-                source = data["source"]
-                # For single-file formats (Arduino), return empty header
-                return "", source
-            
-            # Check for modular format
-            header = data.get("header", "")
-            source = data.get("source", "")
-            if header or source:
-                return header, source
-        except (json.JSONDecodeError, ValueError):
-            pass
+        # Remove backticks if still present
+        json_content = content.strip('`').strip()
+        if json_content[:1] == '{':
+            try:
+                data = orjson.loads(json_content) if orjson is not None else json.loads(json_content)
+
+                # Check for "source" key (Arduino single file)
+                if "source" in data and "header" not in data:
+                    source = data["source"]
+                    # For single-file formats (Arduino), return empty header
+                    return "", source
+
+                # Check for modular format
+                header = data.get("header", "")
+                source = data.get("source", "")
+                if header or source:
+                    return header, source
+            except (json.JSONDecodeError, ValueError):
+                pass
 
         # Step 3: Try marked sections
         if "###HEADER###" in content and "###SOURCE###" in content:
-            parts = content.split("###HEADER###")
-            if len(parts) > 1:
-                header_part = parts[1].split("###SOURCE###")[0].strip()
-                source_part = parts[1].split("###SOURCE###")[1].strip() if "###SOURCE###" in parts[1] else ""
-                return header_part, source_part
+            _, _, after_h = content.partition("###HEADER###")
+            if after_h:
+                header_part, _, source_part = after_h.partition("###SOURCE###")
+                return header_part.strip(), source_part.strip()
         
         # Step 4: Check if it's Arduino-style (no header needed)
         if "void setup(" in content or "void loop(" in content or ".ino" in generated_raw:
@@ -262,8 +351,7 @@ class CodeAgent(AgentBase):
         lines = content.split("\n")
         header_end = 0
         for i, line in enumerate(lines):
-            if line.startswith("int ") or line.startswith("void ") or \
-               line.startswith("uint") or line.startswith("float "):
+            if line.startswith(_FUNC_PREFIXES):
                 header_end = i
                 break
 
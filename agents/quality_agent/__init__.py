@@ -3,13 +3,29 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List
 from datetime import datetime
 
+from core.ai.llm_cache import disk_cached_generate
+from core.artifacts import write_artifact
+
 from ..base import AgentBase, AgentResult
 
+try:  # optional fast JSON encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+# Static-analysis patterns, compiled once; _calculate_metrics applies them to
+# every generated source file
+_GOTO_RE = re.compile(r'goto\s+\w+')
+_MALLOC_RE = re.compile(r'malloc\s*\(')
+_FREE_RE = re.compile(r'free\s*\(')
+
 
 class QualityAgent(AgentBase):
     def __init__(self):
@@ -29,8 +45,8 @@ class QualityAgent(AgentBase):
         metrics = self._calculate_metrics(module_dir, test_dir)
         
         # Extract MCU and board info
-        target_mcu = context.target_mcu if hasattr(context, 'target_mcu') else inputs.get("target_mcu", "Unknown")
-        modules = context.modules if hasattr(context, 'modules') else inputs.get("modules", [])
+        target_mcu = getattr(context, 'target_mcu', None) or inputs.get("target_mcu", "Unknown")
+        modules = getattr(context, 'modules', None) or inputs.get("modules", [])
         
         # Run LLM-based quality analysis (for MISRA-C, etc)
         rag_ctx = context.rag.query("quality and static analysis rules", top_k=3)
@@ -42,19 +58,23 @@ class QualityAgent(AgentBase):
             mcu=target_mcu,
             modules=modules
         )
-        generated = context.llm.generate(prompt)
+        generated = disk_cached_generate(context.llm, prompt)
         
         # Combine metrics with LLM analysis into comprehensive report
         quality_report = self._generate_quality_report(metrics, generated)
         
+        # Serialize via orjson when available (~5-10x faster on nested dicts)
+        if orjson is not None:
+            report_json = orjson.dumps(quality_report, option=orjson.OPT_INDENT_2).decode()
+        else:
+            report_json = json.dumps(quality_report, indent=2)
+
         # Write quality report as JSON artifact (write to "reports" as per MCP permissions)
-        from core.artifacts import write_artifact
-        
         path = write_artifact(
-            context, 
-            self.agent_id, 
-            "reports", 
-            json.dumps(quality_report, indent=2),
+            context,
+            self.agent_id,
+            "reports",
+            report_json,
             metadata={"prompt_version": "v1", "metrics_included": True},
             module_id=None,
             prompt_version="v1"
@@ -84,36 +104,70 @@ class QualityAgent(AgentBase):
             "test_files_found": 0
         }
         
-        if module_dir.exists():
-            source_files = list(module_dir.rglob("*.c")) + list(module_dir.rglob("*.h"))
-            metrics["modules_analyzed"] = len(set(f.parent for f in source_files))
+        # One recursive walk per tree instead of two rglob passes; suffix
+        # filtering on plain strings avoids per-entry stat calls
+        source_files: List[Path] = []
+        module_parents = set()
+        for root, _, files in os.walk(module_dir):
+            for f in files:
+                if f.endswith(('.c', '.h')):
+                    source_files.append(Path(root) / f)
+                    module_parents.add(root)
+        if source_files:
+            metrics["modules_analyzed"] = len(module_parents)
             
-            for source_file in source_files:
-                try:
-                    content = source_file.read_text(errors='ignore')
-                    lines = content.split('\n')
-                    code_lines = [l for l in lines if l.strip() and not l.strip().startswith('//')]
-                    metrics["lines_of_code"] += len(code_lines)
-                    
+            # Per-file analysis is I/O-bound, so files are processed in
+            # parallel and the small result dicts reduced afterwards
+            with ThreadPoolExecutor(max_workers=min(8, len(source_files))) as ex:
+                for result in ex.map(self._analyze_source_file, source_files):
+                    if result is None:
+                        continue
+                    metrics["lines_of_code"] += result["loc"]
                     # MISRA-C checks
-                    if re.search(r'goto\s+\w+', content):
+                    if result["goto"]:
                         metrics["misra_violations"] += 1
-                    
                     # Memory issue checks
-                    if re.search(r'malloc\s*\(', content) and not re.search(r'free\s*\(', content):
+                    if result["malloc_no_free"]:
                         metrics["memory_issues"] += 1
-                    
-                except Exception as e:
-                    logging.warning(f"Error analyzing {source_file}: {e}")
         
-        if test_dir.exists():
-            test_files = list(test_dir.rglob("*test*.c")) + list(test_dir.rglob("*test*.h"))
-            metrics["test_files_found"] = len(test_files)
-            if metrics["modules_analyzed"] > 0 and test_files:
-                metrics["code_coverage"] = min(100, 60 + (len(test_files) * 10))
+        test_files = [
+            f
+            for _, _, files in os.walk(test_dir)
+            for f in files
+            if 'test' in f.lower() and f.endswith(('.c', '.h'))
+        ]
+        metrics["test_files_found"] = len(test_files)
+        if metrics["modules_analyzed"] > 0 and test_files:
+            metrics["code_coverage"] = min(100, 60 + (len(test_files) * 10))
         
         return metrics
 
+    @staticmethod
+    def _analyze_source_file(source_file: Path) -> Dict[str, Any] | None:
+        """Analyze one source file, streaming line-by-line.
+
+        Peak memory stays at one line instead of the whole file, and the
+        pattern flags latch once matched. Returns None on read errors.
+        """
+        try:
+            loc = 0
+            has_goto = has_malloc = has_free = False
+            with open(source_file, 'r', errors='ignore') as fh:
+                for line in fh:
+                    s = line.strip()
+                    if s and not s.startswith('//'):
+                        loc += 1
+                    if not has_goto and _GOTO_RE.search(line):
+                        has_goto = True
+                    if not has_malloc and _MALLOC_RE.search(line):
+                        has_malloc = True
+                    if not has_free and _FREE_RE.search(line):
+                        has_free = True
+            return {"loc": loc, "goto": has_goto, "malloc_no_free": has_malloc and not has_free}
+        except Exception as e:
+            logging.warning(f"Error analyzing {source_file}: {e}")
+            return None
+
     def _generate_quality_report(self, metrics: Dict[str, Any], llm_analysis: str) -> Dict[str, Any]:
         """Generate comprehensive quality report with metrics."""
         overall_score = self._calculate_score(metrics)
@@ -1,6 +1,9 @@
 """Test Agent: produces unit tests for generated modules and enforces test coverage rules."""
 from __future__ import annotations
 
+from core.ai.llm_cache import disk_cached_generate
+from core.artifacts import write_artifact_async
+
 from ..base import AgentBase, AgentResult
 
 
@@ -19,11 +22,14 @@ class TestAgent(AgentBase):
         context.mcp.check_write(self.agent_id, "tests")
 
         # Extract MCU and board info
-        target_mcu = context.target_mcu if hasattr(context, 'target_mcu') else inputs.get("target_mcu", "Unknown")
-        modules = context.modules if hasattr(context, 'modules') else inputs.get("modules", [])
+        target_mcu = getattr(context, 'target_mcu', None) or inputs.get("target_mcu", "Unknown")
+        modules = getattr(context, 'modules', None) or inputs.get("modules", [])
 
         rag_ctx = context.rag.query("unit test patterns", top_k=3)
-        prompt = context.prompt_loader.compose(
+        # Compose as (static prefix, dynamic suffix): the role/constraints/RAG
+        # prefix is identical across modules, so prefix-caching backends only
+        # prefill the module-specific tail
+        parts = context.prompt_loader.compose_parts(
             "test_agent",
             constraints="Deterministic tests only. Generate both test code and test case tables.",
             rag_context=rag_ctx,
@@ -31,15 +37,14 @@ class TestAgent(AgentBase):
             mcu=target_mcu,
             modules=modules
         )
-        generated = context.llm.generate(prompt)
+        generated = disk_cached_generate(context.llm, parts)
         
         # Parse dual output format: test code and test cases
         test_code, test_cases = self._extract_test_artifacts(generated)
         
-        from core.artifacts import write_artifact
-
-        # Write test code (.c file)
-        code_path = write_artifact(
+        # Write test code (.c) and test cases (.md) concurrently on the
+        # shared I/O pool; paths are collected before returning
+        code_future = write_artifact_async(
             context,
             self.agent_id,
             "tests",
@@ -49,9 +54,7 @@ class TestAgent(AgentBase):
             prompt_version="v1",
             extension="c"
         )
-        
-        # Write test cases (.md file)
-        cases_path = write_artifact(
+        cases_future = write_artifact_async(
             context,
             self.agent_id,
             "tests",
@@ -61,6 +64,8 @@ class TestAgent(AgentBase):
             prompt_version="v1",
             extension="md"
         )
+        code_path = code_future.result()
+        cases_path = cases_future.result()
         
         return AgentResult(
             success=True,
@@ -76,12 +81,11 @@ class TestAgent(AgentBase):
         test_cases = ""
         
         if "###TEST_CODE###" in generated and "###TEST_CASES###" in generated:
-            parts = generated.split("###TEST_CODE###")
-            if len(parts) > 1:
-                code_part = parts[1].split("###TEST_CASES###")[0].strip()
-                cases_part = parts[1].split("###TEST_CASES###")[1].strip() if "###TEST_CASES###" in parts[1] else ""
-                test_code = code_part
-                test_cases = cases_part
+            _, _, after_marker = generated.partition("###TEST_CODE###")
+            if after_marker:
+                code_part, _, cases_part = after_marker.partition("###TEST_CASES###")
+                test_code = code_part.strip()
+                test_cases = cases_part.strip()
         else:
             # Fallback: treat entire output as test code
             test_code = generated
@@ -2,39 +2,56 @@
 Provides RESTful API endpoints for firmware generation and orchestration.
 Powered by LangChain + LangGraph agentic AI stack.
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 from datetime import datetime
+import asyncio
+import hashlib
 import json
 import logging
-import uuid
+import secrets
+import sqlite3
+import threading
+import time
 import sys
 import os
 from enum import Enum
+from functools import lru_cache
+
+try:  # optional fast JSON parser
+    import orjson
+except ImportError:
+    orjson = None
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.orchestration.orchestrator import Orchestrator
 from core.orchestration.langgraph_orchestrator import LangGraphOrchestrator
-from core.ai.gemini_wrapper import create_llm_client
+from core.ai.gemini_wrapper import LLMConfig, create_llm_client
 from core.ai.langchain_llm import create_langchain_client
 from core.ai.prompt import PromptLoader
+from core.logging_setup import setup_async_logging
 from core.mcp.mcp import MCP
 from core.rag.rag import RAG
 
-# Configure logging
+# Configure logging; records drain on a background thread so request
+# handlers and agents never block on log I/O
 logging.basicConfig(level=logging.INFO)
+setup_async_logging()
 logger = logging.getLogger("cyberforge.api")
 
-# Initialize FastAPI app
+# Initialize FastAPI app; responses are serialized with orjson when it is
+# installed (3-10x faster than stdlib json on the large listing payloads)
 app = FastAPI(
     title="CyberForge-26 API",
     description="AI-assisted firmware generation platform — powered by LangChain & LangGraph",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
 )
 
 # Add CORS middleware to allow React frontend
@@ -127,10 +144,165 @@ class HealthResponse(BaseModel):
     engine: str = "langgraph"
 
 
-# ============ In-Memory State ============
-# In production, use a proper database
+# ============ Run State ============
+# The dict is the hot read path; every write goes through _persist_run into
+# a WAL-mode SQLite database so runs survive restarts instead of being
+# fabricated from disk scans with started_at=None.
 runs: Dict[str, RunStatus] = {}
 
+_STATE_DB_PATH = Path("output") / "state.db"
+_state_db_conn: Optional[sqlite3.Connection] = None
+_state_db_lock = threading.Lock()
+# run_id -> monotonic timestamp of the last persisted progress update
+_last_persist: Dict[str, float] = {}
+_PERSIST_DEBOUNCE_S = 0.2
+
+
+def _state_db() -> sqlite3.Connection:
+    """Open (once) the run-state database with WAL journaling."""
+    global _state_db_conn
+    if _state_db_conn is None:
+        _STATE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(_STATE_DB_PATH, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                started_at TEXT,
+                completed_at TEXT,
+                artifacts TEXT,
+                errors TEXT,
+                output_dir TEXT
+            )"""
+        )
+        _state_db_conn = conn
+    return _state_db_conn
+
+
+def _persist_run(status: RunStatus, debounce: bool = False) -> None:
+    """UPSERT a run row; progress bumps are coalesced within 200 ms."""
+    now = time.monotonic()
+    if debounce and now - _last_persist.get(status.run_id, 0.0) < _PERSIST_DEBOUNCE_S:
+        return
+    try:
+        with _state_db_lock:
+            _state_db().execute(
+                """INSERT INTO runs (run_id, status, progress, message, started_at,
+                                     completed_at, artifacts, errors, output_dir)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(run_id) DO UPDATE SET
+                       status=excluded.status, progress=excluded.progress,
+                       message=excluded.message, started_at=excluded.started_at,
+                       completed_at=excluded.completed_at, artifacts=excluded.artifacts,
+                       errors=excluded.errors, output_dir=excluded.output_dir""",
+                (
+                    status.run_id,
+                    status.status.value,
+                    status.progress,
+                    status.message,
+                    status.started_at,
+                    status.completed_at,
+                    json.dumps(status.artifacts) if status.artifacts is not None else None,
+                    json.dumps(status.errors) if status.errors is not None else None,
+                    status.output_dir,
+                ),
+            )
+        _last_persist[status.run_id] = now
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to persist run {status.run_id}: {e}")
+
+
+def _load_persisted_runs() -> None:
+    """Hydrate the in-memory run table from the state database at startup."""
+    try:
+        with _state_db_lock:
+            rows = _state_db().execute(
+                """SELECT run_id, status, progress, message, started_at,
+                          completed_at, artifacts, errors, output_dir
+                   FROM runs ORDER BY started_at DESC LIMIT 100"""
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not load persisted runs: {e}")
+        return
+    for row in rows:
+        runs[row[0]] = RunStatus(
+            run_id=row[0],
+            status=GenerationStatus(row[1]),
+            progress=row[2],
+            message=row[3],
+            started_at=row[4],
+            completed_at=row[5],
+            artifacts=json.loads(row[6]) if row[6] else None,
+            errors=json.loads(row[7]) if row[7] else None,
+            output_dir=row[8],
+        )
+
+
+_load_persisted_runs()
+
+# Listing caches keyed by source-directory mtime_ns: hot list endpoints skip
+# the per-entry stat/readdir fan-out until the directory actually changes.
+# Cleared when a generation starts or finishes.
+_LIST_CACHE: Dict[str, tuple] = {}
+
+
+# In-flight request dedupe: normalized-request hash -> run_id. A duplicate
+# POST (e.g. a double-clicked Generate button) reuses the running run instead
+# of paying a second full LLM orchestration.
+_INFLIGHT: Dict[str, str] = {}
+
+
+def _dedupe_key(request: "GenerationRequest") -> str:
+    """Stable hash of a generation request, ignoring credentials."""
+    source = request.model_dump(exclude={"api_key"})
+    if orjson is not None:
+        raw = orjson.dumps(source, option=orjson.OPT_SORT_KEYS)
+    else:
+        raw = json.dumps(source, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(raw).hexdigest()
+
+
+def _file_etag(path: Path) -> str:
+    """Weak-validator ETag from mtime + size; cheap and stable per version."""
+    st = path.stat()
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _dir_mtime_ns(path: Path) -> int:
+    """Directory mtime in ns, or -1 when it does not exist."""
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _run_id_by_folder() -> Dict[str, str]:
+    """Reverse index of output folder -> in-memory run id."""
+    return {r.output_dir: rid for rid, r in runs.items() if r.output_dir}
+
+
+def _walk_files(root: str):
+    """Yield DirEntry objects for every file under root (iterative scandir).
+
+    DirEntry caches the stat from the directory scan, so size and mtime come
+    without extra syscalls; no intermediate Path objects are allocated.
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.is_file():
+                        yield e
+        except FileNotFoundError:
+            continue
+
 
 # ============ API Endpoints ============
 
@@ -152,34 +324,49 @@ async def list_runs() -> List[RunStatus]:
     # Start with in-memory runs
     run_list = list(runs.values())
 
-    # Add on-disk runs (from output/runs) if not already in memory
+    # Add on-disk runs (from output/runs) if not already in memory; the scan
+    # (names + mtimes) is cached until the directory itself changes
     runs_dir = Path("output/runs")
-    if runs_dir.exists():
-        for p in runs_dir.iterdir():
-            if p.is_dir():
-                run_id = p.name
-                if run_id not in runs:
-                    run_list.append(
-                        RunStatus(
-                            run_id=run_id,
-                            status=GenerationStatus.COMPLETED,
-                            progress=100,
-                            message="Loaded from disk",
-                            started_at=None,
-                            completed_at=None,
-                            artifacts=None,
-                            errors=None,
-                            output_dir=run_id
-                        )
-                    )
+    cache_key = _dir_mtime_ns(runs_dir)
+    cached = _LIST_CACHE.get("runs")
+    if cached is not None and cached[0] == cache_key:
+        disk_entries = cached[1]
+    else:
+        def _scan() -> list:
+            entries = []
+            try:
+                with os.scandir(runs_dir) as it:
+                    for e in it:
+                        if e.is_dir(follow_symlinks=False):
+                            entries.append((e.name, e.stat().st_mtime))
+            except FileNotFoundError:
+                pass
+            return entries
+
+        # One thread hop for the whole scan keeps the event loop responsive
+        disk_entries = await asyncio.to_thread(_scan)
+        _LIST_CACHE["runs"] = (cache_key, disk_entries)
+
+    mtimes = dict(disk_entries)
+    for run_id, _ in disk_entries:
+        if run_id not in runs:
+            run_list.append(
+                RunStatus(
+                    run_id=run_id,
+                    status=GenerationStatus.COMPLETED,
+                    progress=100,
+                    message="Loaded from disk",
+                    started_at=None,
+                    completed_at=None,
+                    artifacts=None,
+                    errors=None,
+                    output_dir=run_id
+                )
+            )
 
     # Sort newest first by directory mtime when possible
     def _run_sort_key(r: RunStatus) -> float:
-        try:
-            p = Path("output/runs") / (r.output_dir or r.run_id)
-            return p.stat().st_mtime
-        except Exception:
-            return 0.0
+        return mtimes.get(r.output_dir or r.run_id, 0.0)
 
     return sorted(run_list, key=_run_sort_key, reverse=True)
 
@@ -219,7 +406,23 @@ async def generate_firmware(
     This endpoint accepts a system specification and starts an async
     orchestration pipeline that generates firmware, tests, and reports.
     """
-    run_id = str(uuid.uuid4())[:8]
+    # Identical specification already generating? Point the caller at it.
+    dedupe_key = _dedupe_key(request)
+    existing_id = _INFLIGHT.get(dedupe_key)
+    if existing_id is not None:
+        existing = runs.get(existing_id)
+        if existing is not None and existing.status in (GenerationStatus.QUEUED, GenerationStatus.RUNNING):
+            logger.info(f"Duplicate generate request; reusing in-flight run {existing_id}")
+            return GenerationResponse(
+                run_id=existing_id,
+                status=existing.status,
+                message=f"Identical generation already in flight: {existing_id}",
+            )
+        _INFLIGHT.pop(dedupe_key, None)
+
+    # 8 hex chars straight from the CSPRNG — same shape as the old truncated
+    # uuid4 without the UUID formatting detour
+    run_id = secrets.token_hex(4)
 
     # Create a unique run output folder using the project name + run id
     project_folder = request.specification.project_name.replace(" ", "_").replace("-", "_")
@@ -233,7 +436,11 @@ async def generate_firmware(
         output_dir=unique_output_folder
     )
     runs[run_id] = status
-    
+    _persist_run(status)
+    _INFLIGHT[dedupe_key] = run_id
+    # New run output is about to appear; drop cached listings
+    _LIST_CACHE.clear()
+
     # Apply per-request model configuration (best-effort)
     # Log incoming request (avoid printing secrets)
     try:
@@ -241,24 +448,14 @@ async def generate_firmware(
     except Exception:
         logger.info("Incoming generate request (failed to format details)")
 
-    if request.model_provider:
-        provider = request.model_provider.lower()
-        if provider == "gemini":
-            os.environ["USE_REAL_GEMINI"] = "1"
-        elif provider == "mock":
-            os.environ["USE_REAL_GEMINI"] = "0"
-        else:
-            # leave as-is for unknown providers
-            pass
-    if request.api_key:
-        # store key for background orchestration; avoid logging the secret
-        os.environ["GEMINI_API_KEY"] = request.api_key
-    if request.model_name:
-        # allow per-request model override (e.g. gemini-pro-v1)
-        os.environ["GEMINI_MODEL"] = request.model_name
-
-    # DEBUG: confirm environment flags after applying
-    logger.info(f"Env flags after request: USE_REAL_GEMINI={os.environ.get('USE_REAL_GEMINI')}, GEMINI_API_KEY_present={bool(os.environ.get('GEMINI_API_KEY'))}, GEMINI_MODEL={os.environ.get('GEMINI_MODEL')}")
+    # Provider/key/model travel in a request-scoped config instead of
+    # os.environ, so concurrent generations cannot leak credentials or
+    # provider choices into each other
+    llm_config = LLMConfig(
+        provider=(request.model_provider or "mock").lower(),
+        api_key=request.api_key or os.environ.get("GEMINI_API_KEY"),
+        model=request.model_name,
+    )
 
     # Convert request to dict for orchestrator
     payload = {
@@ -284,7 +481,8 @@ async def generate_firmware(
     background_tasks.add_task(
         _run_orchestration,
         run_id=run_id,
-        payload=payload
+        payload=payload,
+        llm_config=llm_config,
     )
     
     return GenerationResponse(
@@ -295,8 +493,14 @@ async def generate_firmware(
 
 
 @app.get("/api/output/{run_id}/{file_path:path}", tags=["output"])
-async def get_output_file(run_id: str, file_path: str):
-    """Get generated artifact file"""
+async def get_output_file(run_id: str, file_path: str, request: Request, wrap: int = 0):
+    """Get generated artifact file.
+
+    Streams the file directly (zero-copy sendfile path) instead of escaping
+    it through a JSON envelope; pass ``?wrap=1`` for the legacy
+    ``{"content": ...}`` shape. Unchanged files answer 304 via ETag so
+    polling clients skip the body entirely.
+    """
     try:
         # run_id may be either the real run uuid (key in `runs`) or the folder name (legacy)
         folder = run_id
@@ -307,14 +511,34 @@ async def get_output_file(run_id: str, file_path: str):
         if not output_path.exists():
             raise HTTPException(status_code=404, detail="File not found")
 
-        return {"content": output_path.read_text(encoding="utf-8", errors="ignore")}
+        etag = _file_etag(output_path)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        if wrap:
+            content = await asyncio.to_thread(output_path.read_text, encoding="utf-8", errors="ignore")
+            return JSONResponse({"content": content}, headers={"ETag": etag})
+
+        if output_path.suffix.lower() == '.json':
+            # Already-serialized JSON goes out verbatim, no re-parse/re-dump
+            data = await asyncio.to_thread(output_path.read_bytes)
+            return Response(data, media_type="application/json", headers={"ETag": etag})
+
+        return FileResponse(output_path, media_type="text/plain", headers={"ETag": etag})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/artifacts/runs/{run_id}/{file_path:path}", tags=["artifacts"])
-async def get_artifact_file(run_id: str, file_path: str):
-    """Get artifact file - alias for output endpoint"""
+async def get_artifact_file(run_id: str, file_path: str, request: Request, wrap: int = 0):
+    """Get artifact file - alias for output endpoint.
+
+    JSON artifacts are streamed verbatim as ``application/json``; other files
+    stream via FileResponse. Pass ``?wrap=1`` for the legacy
+    ``{"content": ...}`` envelope. Supports ETag/If-None-Match.
+    """
     try:
         # run_id may be either the real run uuid (key in `runs`) or the folder name (legacy)
         folder = run_id
@@ -325,17 +549,20 @@ async def get_artifact_file(run_id: str, file_path: str):
         if not output_path.exists():
             raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
 
-        # For JSON files, parse and return the actual JSON
+        etag = _file_etag(output_path)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        if wrap:
+            content = await asyncio.to_thread(output_path.read_text, encoding="utf-8", errors="ignore")
+            return JSONResponse({"content": content}, headers={"ETag": etag})
+
         if output_path.suffix.lower() == '.json':
-            try:
-                content = output_path.read_text(encoding="utf-8", errors="ignore")
-                return json.loads(content)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return as text
-                return {"content": content}
-        
-        # For other files, return wrapped in content
-        return {"content": output_path.read_text(encoding="utf-8", errors="ignore")}
+            # Already-serialized JSON goes out verbatim, no re-parse/re-dump
+            data = await asyncio.to_thread(output_path.read_bytes)
+            return Response(data, media_type="application/json", headers={"ETag": etag})
+
+        return FileResponse(output_path, media_type="text/plain", headers={"ETag": etag})
     except HTTPException:
         raise
     except Exception as e:
@@ -343,105 +570,168 @@ async def get_artifact_file(run_id: str, file_path: str):
 
 
 @app.get("/api/templates", tags=["templates"])
-async def get_templates() -> Dict[str, Any]:
-    """Get available templates and examples"""
+async def get_templates() -> Response:
+    """Get available templates and examples.
+
+    Templates change at deploy time, not request time, so the response is
+    kept as one pre-serialized JSON blob and served straight from memory;
+    the blob is rebuilt only when the examples directory mtime changes.
+    """
     examples_dir = Path("examples")
-    templates = {}
-    
-    for example_file in examples_dir.glob("*.json"):
-        try:
-            templates[example_file.stem] = json.loads(example_file.read_text())
-        except Exception as e:
-            logger.warning(f"Failed to load template {example_file}: {e}")
-    
-    return templates
+    cache_key = _dir_mtime_ns(examples_dir)
+    cached = _LIST_CACHE.get("templates")
+    if cached is not None and cached[0] == cache_key:
+        return Response(cached[1], media_type="application/json")
+
+    def _load() -> bytes:
+        templates = {}
+        for example_file in examples_dir.glob("*.json"):
+            try:
+                # Parse bytes directly; orjson skips the UTF-8 decode step
+                raw = example_file.read_bytes()
+                templates[example_file.stem] = (
+                    orjson.loads(raw) if orjson is not None else json.loads(raw)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load template {example_file}: {e}")
+        if orjson is not None:
+            return orjson.dumps(templates)
+        return json.dumps(templates).encode("utf-8")
+
+    blob = await asyncio.to_thread(_load)
+    _LIST_CACHE["templates"] = (cache_key, blob)
+    return Response(blob, media_type="application/json")
 
 
 @app.get("/api/artifacts", tags=["artifacts"])
 async def list_artifacts() -> List[Dict[str, Any]]:
     """List all generated artifacts across runs. Excludes metadata sidecars."""
-    artifacts: List[Dict[str, Any]] = []
     runs_dir = Path("output/runs")
-    if not runs_dir.exists():
-        return artifacts
+    cache_key = _dir_mtime_ns(runs_dir)
+    cached = _LIST_CACHE.get("artifacts")
+    if cached is not None and cached[0] == cache_key:
+        entries = cached[1]
+    else:
+        def _scan() -> list:
+            entries = []
+            with os.scandir(runs_dir) as run_it:
+                run_dirs = [e.path for e in run_it if e.is_dir(follow_symlinks=False)]
+            for run_path in run_dirs:
+                run_name = os.path.basename(run_path)
+                with os.scandir(run_path) as cat_it:
+                    category_dirs = [e.path for e in cat_it if e.is_dir(follow_symlinks=False)]
+                for category_path in category_dirs:
+                    for artifact in _walk_files(category_path):
+                        # Skip metadata sidecars only
+                        if artifact.name.endswith(".meta.json"):
+                            continue
+                        rel_path = os.path.relpath(artifact.path, run_path)
+                        st = artifact.stat()
+                        entries.append({
+                            "folder": run_name,
+                            "category": os.path.basename(category_path),
+                            "file_path": rel_path.replace("\\", "/"),
+                            "file_name": artifact.name,
+                            "size": st.st_size,
+                            "updated_at": datetime.fromtimestamp(st.st_mtime).isoformat(),
+                        })
+            entries.sort(key=lambda x: x["updated_at"], reverse=True)
+            return entries
 
-    for run_dir in runs_dir.iterdir():
-        if not run_dir.is_dir():
-            continue
-        for category_dir in run_dir.iterdir():
-            if not category_dir.is_dir():
-                continue
-            for artifact in category_dir.rglob("*"):
-                if artifact.is_file():
-                    # Skip metadata sidecars only
-                    if artifact.name.endswith(".meta.json"):
-                        continue
-                    rel_path = artifact.relative_to(run_dir)
-                    # try to find a matching run_id in memory where output_dir == run_dir.name
-                    matched_run_id = None
-                    for rid, rstatus in runs.items():
-                        if (rstatus.output_dir or "") == run_dir.name:
-                            matched_run_id = rid
-                            break
-
-                    artifacts.append({
-                        "run_id": matched_run_id or run_dir.name,
-                        "category": category_dir.name,
-                        "file_path": str(rel_path).replace("\\", "/"),
-                        "file_name": artifact.name,
-                        "size": artifact.stat().st_size,
-                        "updated_at": datetime.fromtimestamp(artifact.stat().st_mtime).isoformat(),
-                    })
+        entries = await asyncio.to_thread(_scan) if cache_key >= 0 else []
+        _LIST_CACHE["artifacts"] = (cache_key, entries)
 
-    artifacts.sort(key=lambda x: x["updated_at"], reverse=True)
-    return artifacts
+    # Map output folders to in-memory run ids via one reverse index instead
+    # of an O(runs) scan per artifact
+    run_ids = _run_id_by_folder()
+    return [
+        {
+            "run_id": run_ids.get(e["folder"], e["folder"]),
+            "category": e["category"],
+            "file_path": e["file_path"],
+            "file_name": e["file_name"],
+            "size": e["size"],
+            "updated_at": e["updated_at"],
+        }
+        for e in entries
+    ]
 
 
 @app.get("/api/docs/rag", tags=["documentation"])
 async def get_rag_docs() -> Dict[str, List[str]]:
-    """Get available RAG documentation"""
+    """Get available RAG documentation.
+
+    Snippets are precomputed and cached on the directory mtime — the docs
+    change at deploy time, so the steady state is a dict fetch. Only the
+    first ~600 bytes of each file are read and decoded for the 500-char
+    preview instead of the whole document.
+    """
     rag_dir = Path("rag_docs")
-    docs = {}
-    
-    for doc_file in rag_dir.glob("*.md"):
-        if doc_file.name != "README.md":
-            docs[doc_file.stem] = [doc_file.stem, doc_file.read_text()[:500] + "..."]
-    
+    cache_key = _dir_mtime_ns(rag_dir)
+    cached = _LIST_CACHE.get("rag_docs")
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+
+    def _build() -> Dict[str, List[str]]:
+        docs = {}
+        for doc_file in rag_dir.glob("*.md"):
+            if doc_file.name != "README.md":
+                with doc_file.open("rb") as fh:
+                    snippet = fh.read(600).decode("utf-8", "ignore")[:500]
+                docs[doc_file.stem] = [doc_file.stem, snippet + "..."]
+        return docs
+
+    docs = await asyncio.to_thread(_build)
+    _LIST_CACHE["rag_docs"] = (cache_key, docs)
     return docs
 
 
 @app.get("/api/architectures", tags=["architecture"])
 async def get_all_architectures() -> List[Dict[str, Any]]:
     """Get all generated architecture files"""
-    architectures = []
     runs_dir = Path("output/runs")
-    
-    if not runs_dir.exists():
+    cache_key = _dir_mtime_ns(runs_dir)
+    cached = _LIST_CACHE.get("architectures")
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+
+    if cache_key < 0:
+        return []
+
+    def _scan() -> list:
+        architectures = []
+        with os.scandir(runs_dir) as run_it:
+            run_dirs = [e.path for e in run_it if e.is_dir(follow_symlinks=False)]
+        for run_path in run_dirs:
+            run_name = os.path.basename(run_path)
+            try:
+                with os.scandir(os.path.join(run_path, "architecture")) as arch_it:
+                    arch_files = [e for e in arch_it if e.is_file() and e.name.endswith(".txt")]
+            except FileNotFoundError:
+                continue
+            for arch_file in arch_files:
+                try:
+                    architectures.append({
+                        "run_id": run_name,
+                        "filename": arch_file.name,
+                        "content": Path(arch_file.path).read_text(encoding='utf-8'),
+                        "timestamp": datetime.fromtimestamp(arch_file.stat().st_mtime).isoformat()
+                    })
+                except Exception as e:
+                    logger.warning(f"Failed to read architecture file {arch_file.path}: {e}")
+
+        # Sort by timestamp descending
+        architectures.sort(key=lambda x: x["timestamp"], reverse=True)
         return architectures
-    
-    for run_dir in runs_dir.iterdir():
-        if run_dir.is_dir():
-            arch_dir = run_dir / "architecture"
-            if arch_dir.exists():
-                for arch_file in arch_dir.glob("*.txt"):
-                    try:
-                        architectures.append({
-                            "run_id": run_dir.name,
-                            "filename": arch_file.name,
-                            "content": arch_file.read_text(encoding='utf-8'),
-                            "timestamp": datetime.fromtimestamp(arch_file.stat().st_mtime).isoformat()
-                        })
-                    except Exception as e:
-                        logger.warning(f"Failed to read architecture file {arch_file}: {e}")
-    
-    # Sort by timestamp descending
-    architectures.sort(key=lambda x: x["timestamp"], reverse=True)
+
+    architectures = await asyncio.to_thread(_scan)
+    _LIST_CACHE["architectures"] = (cache_key, architectures)
     return architectures
 
 
 @app.get("/api/runs/{run_id}/architecture", tags=["architecture"])
-async def get_run_architecture(run_id: str) -> Dict[str, Any]:
-    """Get architecture files for a specific run"""
+async def get_run_architecture(run_id: str, request: Request):
+    """Get architecture files for a specific run; answers 304 when unchanged."""
     # map run_id (uuid) to folder name when available
     folder = run_id
     if run_id in runs and runs[run_id].output_dir:
@@ -458,13 +748,20 @@ async def get_run_architecture(run_id: str) -> Dict[str, Any]:
     
     # Get the most recent architecture file
     latest_file = max(arch_files, key=lambda f: f.stat().st_mtime)
-    
-    return {
-        "run_id": run_id,
-        "filename": latest_file.name,
-        "content": latest_file.read_text(encoding='utf-8'),
-        "timestamp": datetime.fromtimestamp(latest_file.stat().st_mtime).isoformat()
-    }
+    etag = _file_etag(latest_file)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    content = await asyncio.to_thread(latest_file.read_text, encoding='utf-8')
+
+    return JSONResponse(
+        {
+            "run_id": run_id,
+            "filename": latest_file.name,
+            "content": content,
+            "timestamp": datetime.fromtimestamp(latest_file.stat().st_mtime).isoformat(),
+        },
+        headers={"ETag": etag},
+    )
 
 
 @app.get("/api/runs/{run_id}/logs", tags=["runs"])
@@ -475,6 +772,26 @@ async def get_run_logs(run_id: str) -> Dict[str, Any]:
     if not run_dir.exists():
         raise HTTPException(status_code=404, detail="Run output directory not found")
 
+    # The whole scan-and-parse pass runs off the event loop in one thread hop
+    return await asyncio.to_thread(_collect_run_logs, run_id, output_dir_name, run_dir)
+
+
+@lru_cache(maxsize=512)
+def _parse_json_cached(path: str, mtime_ns: int) -> Any:
+    """Parse a JSON file, memoized on (path, mtime).
+
+    The UI polls the logs endpoint, so unchanged build logs and quality
+    reports are parsed once instead of on every request; a rewrite bumps the
+    mtime and naturally invalidates the entry.
+    """
+    data = Path(path).read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _collect_run_logs(run_id: str, output_dir_name: str, run_dir: Path) -> Dict[str, Any]:
+    """Read build logs and quality reports for a run (blocking; call off-loop)."""
     def _latest_file(path: Path, extensions: Optional[List[str]] = None) -> Optional[Path]:
         if not path.exists():
             return None
@@ -507,42 +824,43 @@ async def get_run_logs(run_id: str) -> Dict[str, Any]:
         )
         for log_file in log_files:
             try:
-                log_data = json.loads(log_file.read_text(encoding="utf-8", errors="ignore"))
+                st = log_file.stat()
+                log_data = _parse_json_cached(str(log_file), st.st_mtime_ns)
                 build_logs.append({
                     "filename": log_file.name,
                     "path": str(log_file),
-                    "timestamp": datetime.fromtimestamp(log_file.stat().st_mtime).isoformat(),
+                    "timestamp": datetime.fromtimestamp(st.st_mtime).isoformat(),
                     "data": log_data
                 })
             except Exception as exc:
                 logger.warning(f"Failed to read build log {log_file}: {exc}")
     
-    # Get quality reports from reports/ folder
-    # Prioritize the standardized quality_report_latest.json for primary access
+    # Get quality reports from reports/ folder in one directory scan,
+    # partitioning out the standardized quality_report_latest.json so it
+    # stays first; DirEntry stat results are cached from the scan itself
     reports_dir = run_dir / "reports"
-    quality_report_paths = []
-    
-    # First: Latest standardized file (always newest)
-    latest_standardized = reports_dir / "quality_report_latest.json"
-    if latest_standardized.exists():
-        quality_report_paths.append(latest_standardized)
-    
-    # Then: All timestamped reports (for history)
-    if reports_dir.exists():
-        all_reports = [
-            p for p in reports_dir.iterdir() 
-            if p.is_file() and p.suffix in [".json", ".txt"] 
-            and p.name != "quality_report_latest.json"
-        ]
-        # Sort by modification time (newest first)
-        all_reports.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-        quality_report_paths.extend(all_reports)
+    latest_entry = None
+    history = []
+    try:
+        with os.scandir(reports_dir) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if entry.name == "quality_report_latest.json":
+                    latest_entry = entry
+                elif entry.name.endswith((".json", ".txt")):
+                    history.append(entry)
+    except FileNotFoundError:
+        pass
+    # Timestamped reports newest first, behind the standardized copy
+    history.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    quality_report_paths = [Path(e.path) for e in ([latest_entry] if latest_entry else []) + history]
 
     def _read_json(path: Optional[Path]) -> Optional[Dict[str, Any]]:
         if not path:
             return None
         try:
-            return json.loads(path.read_text(encoding="utf-8", errors="ignore"))
+            return _parse_json_cached(str(path), path.stat().st_mtime_ns)
         except Exception as exc:
             logger.warning(f"Failed to read log {path}: {exc}")
             return None
@@ -681,14 +999,42 @@ async def get_tech_stack() -> Dict[str, Any]:
 
 # ============ Background Tasks ============
 
-async def _run_orchestration(run_id: str, payload: Dict[str, Any]) -> None:
+def _count_artifacts(run_output_dir: Path) -> Dict[str, int]:
+    """Tally per-category artifact counts in one walk of the run tree.
+
+    Replaces five separate glob passes; categories mirror the API shape
+    (architecture/code/tests/build/reports). Metadata sidecars are skipped.
+    """
+    counts = {"architecture": 0, "code": 0, "tests": 0, "build": 0, "reports": 0}
+    root = str(run_output_dir)
+    for dirpath, _, files in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        top = "" if rel == "." else rel.split(os.sep, 1)[0]
+        for f in files:
+            if f.endswith(".meta.json"):
+                continue
+            if top == "architecture" and f.endswith(".txt"):
+                counts["architecture"] += 1
+            elif top == "module_code" and f.endswith(".c"):
+                counts["code"] += 1
+            elif top == "tests":
+                counts["tests"] += 1
+            elif top == "build_log" and f.endswith(".json"):
+                counts["build"] += 1
+            elif top == "quality_report" and f.endswith(".json"):
+                counts["reports"] += 1
+    return counts
+
+
+async def _run_orchestration(run_id: str, payload: Dict[str, Any], llm_config: Optional[LLMConfig] = None) -> None:
     """Run orchestration in background using LangGraph pipeline."""
     try:
         # Update status to running
         runs[run_id].status = GenerationStatus.RUNNING
         runs[run_id].progress = 10
         runs[run_id].message = "Starting LangGraph orchestration..."
-        
+        _persist_run(runs[run_id], debounce=True)
+
         logger.info(f"Starting LangGraph orchestration for run {run_id}")
         
         # Set up model provider based on payload
@@ -705,12 +1051,14 @@ async def _run_orchestration(run_id: str, payload: Dict[str, Any]) -> None:
         # Use LangGraph orchestrator
         runs[run_id].progress = 20
         runs[run_id].message = "Running architecture analysis via LangGraph..."
-        
+        _persist_run(runs[run_id], debounce=True)
+
         orch = LangGraphOrchestrator(
             payload,
             output_dir="output",
             run_id=run_id,
             use_real_gemini=use_real_gemini,
+            llm_config=llm_config,
         )
         result = orch.run()
         
@@ -724,15 +1072,7 @@ async def _run_orchestration(run_id: str, payload: Dict[str, Any]) -> None:
             project_name = payload.get("project_name", run_id).replace(" ", "_").replace("-", "_")
             run_output_dir = Path("output/runs") / project_name
             if run_output_dir.exists():
-                test_files = [p for p in run_output_dir.glob("tests/*") if p.is_file() and not p.name.endswith(".meta.json")]
-                artifacts = {
-                    "architecture": len(list(run_output_dir.glob("architecture/*.txt"))),
-                    "code": len(list(run_output_dir.glob("module_code/**/*.c"))),
-                    "tests": len(test_files),
-                    "build": len(list(run_output_dir.glob("build_log/*.json"))),
-                    "reports": len(list(run_output_dir.glob("quality_report/*.json"))),
-                }
-                runs[run_id].artifacts = artifacts
+                runs[run_id].artifacts = _count_artifacts(run_output_dir)
         else:
             runs[run_id].status = GenerationStatus.FAILED
             runs[run_id].message = f"Generation failed: {result.message}"
@@ -745,6 +1085,15 @@ async def _run_orchestration(run_id: str, payload: Dict[str, Any]) -> None:
         runs[run_id].message = f"Error: {str(e)}"
         runs[run_id].errors = [str(e)]
         runs[run_id].completed_at = datetime.utcnow().isoformat()
+    finally:
+        # Terminal state always lands in the database, bypassing the debounce
+        _persist_run(runs[run_id])
+        # The run is no longer in flight; later identical requests start fresh
+        for key, rid in list(_INFLIGHT.items()):
+            if rid == run_id:
+                _INFLIGHT.pop(key, None)
+        # Run output changed; listings must be rebuilt on next request
+        _LIST_CACHE.clear()
 
 
 if __name__ == "__main__":
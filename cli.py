@@ -10,12 +10,19 @@ from pathlib import Path
 import click
 from dotenv import load_dotenv
 
-from core.orchestration.orchestrator import Orchestrator
+from core.logging_setup import setup_async_logging
+
+try:  # optional fast JSON parser
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables from .env file
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
+# Route records through a background queue so agents never block on log I/O
+setup_async_logging()
 logger = logging.getLogger("cyberforge")
 
 
@@ -27,11 +34,17 @@ def main(input_file: str) -> None:
 
     p = Path(input_file)
     try:
-        payload = json.loads(p.read_text())
+        # Parse raw bytes in one pass; orjson skips the intermediate str
+        raw = p.read_bytes()
+        payload = orjson.loads(raw) if orjson is not None else json.loads(raw)
     except Exception:
         logger.error("Failed to parse input; only JSON supported in v0")
         sys.exit(2)
 
+    # Deferred import: the orchestrator pulls in LLM clients and the RAG
+    # stack, which --help and input validation should not pay for
+    from core.orchestration.orchestrator import Orchestrator
+
     orch = Orchestrator(payload)
     res = orch.run()
 
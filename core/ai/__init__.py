@@ -2,3 +2,4 @@
 from .gemini_wrapper import create_llm_client, MockGemini, GeminiClient, LLMClient
 from .langchain_llm import create_langchain_client, LangChainLLM, LangChainMock
 from .prompt import PromptLoader
+from .semantic_cache import SemanticCache, cached_generate
@@ -8,30 +8,162 @@ This module provides:
 """
 from __future__ import annotations
 
+import hashlib
 import os
 import logging
+import threading
 import time
 import random
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from typing import Optional
 
 logger = logging.getLogger("cyberforge.ai.gemini")
 
+# HTTP status codes worth retrying: request timeout, rate limit, server errors
+_RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry predicate shared by the api_core Retry and the manual fallback.
+
+    Covers SDK ServerError types, transport-layer timeouts (httpx raises
+    TimeoutException subclasses the SDK does not wrap), and retryable HTTP
+    status codes carried on the exception.
+    """
+    name = type(exc).__name__
+    if "ServerError" in name or "TimeoutException" in name:
+        return True
+    status_code = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status_code, int) and status_code in _RETRYABLE_STATUS:
+        return True
+    msg = str(exc)
+    return "UNAVAILABLE" in msg or "timed out" in msg.lower()
+
+
+def _retry_call(fn):
+    """Manual bounded-backoff fallback used when google.api_core is absent."""
+    max_attempts = 3
+    base_backoff = 2.0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            result = fn()
+            if attempt > 1:
+                logger.info("GeminiClient: succeeded on attempt %d", attempt)
+            return result
+        except Exception as exc:  # pragma: no cover - runtime/SDK errors
+            if attempt < max_attempts and _is_retryable(exc):
+                backoff = base_backoff * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
+                logger.warning("GeminiClient: transient error (attempt %d/%d): %s — retrying in %.2fs", attempt, max_attempts, type(exc).__name__, backoff)
+                time.sleep(backoff)
+                continue
+            logger.exception("GeminiClient: generation failed (attempt %d/%d): %s", attempt, max_attempts, type(exc).__name__)
+            raise
+
+
+@dataclass(frozen=True, slots=True)
+class LLMConfig:
+    """Request-scoped LLM settings.
+
+    Threaded explicitly through the orchestrators instead of mutating
+    os.environ, so concurrent API requests cannot leak each other's provider,
+    key, or model. Frozen + slots keeps it cheap and immutable.
+    """
+    provider: str = "mock"
+    api_key: Optional[str] = None
+    model: Optional[str] = None
+
 
 class LLMClient:
     def generate(self, prompt: str, max_tokens: int = 512) -> str:
         raise NotImplementedError
 
+    def generate_parts(self, parts: "PromptParts", max_tokens: int = 512) -> str:
+        """Generate from a (static prefix, dynamic suffix) prompt pair.
+
+        Backends that support provider-side prefix caching override this to
+        register the static prefix once and reuse it; the default joins the
+        parts and falls back to plain generate().
+        """
+        return self.generate(parts.text, max_tokens=max_tokens)
+
+    def generate_stream(self, prompt, max_tokens: int = 512):
+        """Yield response chunks as they are produced.
+
+        Default implementation yields the full non-streaming response once so
+        callers can always iterate; streaming backends override this to yield
+        incrementally and let callers overlap decode with I/O.
+        """
+        if hasattr(prompt, "static"):
+            yield self.generate_parts(prompt, max_tokens=max_tokens)
+        else:
+            yield self.generate(prompt, max_tokens=max_tokens)
+
+    def generate_batch(self, prompts: list, max_tokens: int = 512) -> list:
+        """Generate responses for several independent prompts in one call.
+
+        Default implementation is sequential so every backend supports the
+        API; network-bound backends override it to overlap requests and
+        amortize per-call overhead.
+        """
+        return [self.generate(p, max_tokens=max_tokens) for p in prompts]
+
 
 class MockGemini(LLMClient):
-    def __init__(self):
-        self.calls = []
+    def __init__(self, record: bool = True, max_calls: int = 1024, record_full_prompts: bool = False):
+        # Bounded call log: an unbounded list kept every prompt body alive
+        # for the client's lifetime, which adds up in soak tests that push
+        # thousands of large prompts through one instance. By default only
+        # the prompt length and hash are kept; pass record_full_prompts=True
+        # for assertions that need the text.
+        self.record_full_prompts = record_full_prompts
+        self.calls = deque(maxlen=max_calls) if record else None
 
     def generate(self, prompt: str, max_tokens: int = 512) -> str:
-        self.calls.append({"prompt": prompt, "max_tokens": max_tokens})
+        if self.calls is not None:
+            if self.record_full_prompts:
+                self.calls.append({"prompt": prompt, "max_tokens": max_tokens})
+            else:
+                self.calls.append({
+                    "prompt_len": len(prompt),
+                    "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                    "max_tokens": max_tokens,
+                })
         # Return a deterministic, short response useful for tests
         return f"GENERATED (mock): {prompt[:200]}"
 
 
+class LocalVLLMClient(LLMClient):
+    """Self-hosted backend driven through vLLM's continuously-batched engine.
+
+    vLLM schedules all queued prompts into shared forward passes, so handing
+    it a whole batch keeps the GPU saturated instead of decoding one stream
+    at a time. The SDK is imported lazily, like the GenAI SDK above, so the
+    dependency stays optional.
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or os.environ.get("VLLM_MODEL")
+        if not self.model_name:
+            raise RuntimeError("No VLLM_MODEL configured for LocalVLLMClient")
+        try:
+            from vllm import LLM, SamplingParams
+        except Exception as exc:  # pragma: no cover - integration only
+            logger.exception("vLLM import failed: %s", exc)
+            raise
+        self._SamplingParams = SamplingParams
+        self._engine = LLM(model=self.model_name)
+
+    def generate(self, prompt: str, max_tokens: int = 512) -> str:
+        return self.generate_batch([prompt], max_tokens=max_tokens)[0]
+
+    def generate_batch(self, prompts: list, max_tokens: int = 512) -> list:
+        """Submit all prompts in one call; the engine batches them per token step."""
+        params = self._SamplingParams(max_tokens=max_tokens)
+        outputs = self._engine.generate(prompts, params)
+        return [out.outputs[0].text for out in outputs]
+
+
 class GeminiClient(LLMClient):
     def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
@@ -45,64 +177,205 @@ class GeminiClient(LLMClient):
             logger.exception("GenAI SDK import failed: %s", exc)
             raise
         self._genai = genai
+        # One client for the instance's lifetime: re-creating it per call
+        # threw away the underlying HTTP connection pool and TLS session,
+        # paying connection establishment on every request
+        self._client = genai.Client(api_key=self.api_key)
+        # CachedContent handles keyed by static-prefix hash (provider-side prefix cache)
+        self._prefix_cache: dict = {}
+        self._prefix_cache_warned = False
+        # Run-wide CachedContent handle shared across all agent calls
+        self._shared_cache = None
+        # Bounded in-process response memo: exact-match repeats (retried
+        # failures, deterministic replays) skip the network round trip
+        self._memo: "OrderedDict[tuple, str]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        # Battle-tested retry/backoff from api_core when available (handles
+        # jitter, deadline budgets, and Retry-After); _retry_call otherwise
+        try:
+            from google.api_core import retry as gax_retry
+            self._retry = gax_retry.Retry(
+                predicate=_is_retryable, initial=2.0, multiplier=2.0, maximum=30.0, timeout=120.0
+            )
+        except ImportError:
+            self._retry = None
+
+    _MEMO_MAX = 512
+
+    def create_shared_cache(self, system_instruction: str, contents: Optional[list] = None, ttl: str = "7200s") -> None:
+        """Create one provider-side KV cache for the whole run.
+
+        The system instructions and shared corpus (e.g. RAG documents) are
+        prefilled once; every subsequent generate() call references the handle
+        and only pays prefill for its dynamic delta. A no-op when the SDK or
+        model does not support content caching.
+        """
+        try:
+            # google-genai SDK: caches live on the client, not the module
+            self._shared_cache = self._client.caches.create(
+                model=self.model_name,
+                config={
+                    "system_instruction": system_instruction,
+                    "contents": contents or [],
+                    "ttl": ttl,
+                },
+            )
+            logger.info("GeminiClient: created shared run cache")
+        except Exception as exc:
+            logger.warning("GeminiClient: shared cache unavailable: %s", exc)
+            self._shared_cache = None
+
+    def generate_parts(self, parts, max_tokens: int = 512) -> str:
+        """Generate with the static prefix registered as provider-side CachedContent.
+
+        The prefix must be bit-identical across calls for a cache hit, so only
+        the dynamic suffix pays full prefill cost. Falls back to a plain
+        generate() on SDKs/models without caching support.
+        """
+        prefix_key = hashlib.sha256(parts.static.encode("utf-8")).hexdigest()
+        try:
+            cached = self._prefix_cache.get(prefix_key)
+            if cached is None:
+                cached = self._client.caches.create(
+                    model=self.model_name,
+                    config={"contents": [parts.static], "ttl": "3600s"},
+                )
+                self._prefix_cache[prefix_key] = cached
+            response = self._client.models.generate_content(
+                model=self.model_name,
+                contents=parts.dynamic,
+                config={"cached_content": cached.name},
+            )
+            text = getattr(response, "text", None)
+            return text if text is not None else str(response)
+        except Exception as exc:
+            # Surface the first failure: a silent fallback here hides a
+            # permanently dead prefix-cache path
+            if not self._prefix_cache_warned:
+                self._prefix_cache_warned = True
+                logger.warning("GeminiClient: prefix caching unavailable (%s); falling back", exc)
+            else:
+                logger.debug("GeminiClient: prefix caching unavailable (%s); falling back", exc)
+            return self.generate(parts.text, max_tokens=max_tokens)
+
+    def generate_stream(self, prompt, max_tokens: int = 512):
+        """Stream content chunks from Google GenAI as they are decoded.
+
+        Falls back to a single-chunk yield of the blocking generate() when the
+        SDK does not expose a streaming endpoint.
+        """
+        text = prompt.text if hasattr(prompt, "static") else prompt
+        config = {"cached_content": self._shared_cache.name} if self._shared_cache is not None else None
+        try:
+            if config is not None:
+                stream = self._client.models.generate_content_stream(model=self.model_name, contents=text, config=config)
+            else:
+                stream = self._client.models.generate_content_stream(model=self.model_name, contents=text)
+            for chunk in stream:
+                chunk_text = getattr(chunk, "text", None)
+                if chunk_text:
+                    yield chunk_text
+        except AttributeError:
+            yield self.generate(text, max_tokens=max_tokens)
+
+    def generate_batch(self, prompts: list, max_tokens: int = 512) -> list:
+        """Issue independent generation requests concurrently.
+
+        Each request spends most of its time waiting on the network, so a
+        small thread pool turns N sequential round-trips into roughly one.
+        Order of results matches the order of prompts.
+        """
+        if len(prompts) <= 1:
+            return [self.generate(p, max_tokens=max_tokens) for p in prompts]
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(8, len(prompts))) as ex:
+            return list(ex.map(lambda p: self.generate(p, max_tokens=max_tokens), prompts))
 
     def generate(self, prompt: str, max_tokens: int = 512) -> str:
         """Call Google GenAI to generate content with retry/backoff for transient errors.
 
-        Retries are attempted on transient server-side errors (5xx / ServerError / UNAVAILABLE).
+        Retries are attempted on transient failures (408/429/5xx, ServerError,
+        transport timeouts) — via api_core's Retry when installed, or the
+        module-level fallback loop otherwise.
         """
         logger.debug("GeminiClient: generating content (max_tokens=%s, model=%s)", max_tokens, self.model_name)
-        client = self._genai.Client(api_key=self.api_key)
+        memo_key = (self.model_name, max_tokens, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        with self._memo_lock:
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                self._memo.move_to_end(memo_key)
+                return cached
 
-        max_attempts = 3
-        base_backoff = 2.0
-        last_exc = None
+        config = {"cached_content": self._shared_cache.name} if self._shared_cache is not None else None
 
-        for attempt in range(1, max_attempts + 1):
+        def _call() -> str:
+            # Prefer the streaming endpoint: tokens are accumulated as they
+            # decode instead of buffering the full response server-side, and
+            # the joined result is identical to the blocking call's text.
             try:
-                response = client.models.generate_content(model=self.model_name, contents=prompt)
-                text = getattr(response, "text", None)
-                if text is None:
-                    text = str(response)
-                if attempt > 1:
-                    logger.info("GeminiClient: succeeded on attempt %d", attempt)
-                return text
-            except Exception as exc:  # pragma: no cover - runtime/SDK errors
-                last_exc = exc
-                # Try to decide if it's transient (server-side) or fatal
-                name = type(exc).__name__
-                msg = str(exc)
-                status_code = getattr(exc, "status_code", None) or getattr(exc, "code", None)
-                is_server_error = False
-                try:
-                    # numeric status codes are common on HTTP error wrappers
-                    is_server_error = isinstance(status_code, int) and status_code >= 500
-                except Exception:
-                    is_server_error = False
-
-                retryable = is_server_error or ("ServerError" in name) or ("UNAVAILABLE" in msg) or ("timed out" in msg.lower())
-
-                if attempt < max_attempts and retryable:
-                    backoff = base_backoff * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
-                    logger.warning("GeminiClient: transient error (attempt %d/%d): %s — retrying in %.2fs", attempt, max_attempts, name, backoff)
-                    time.sleep(backoff)
-                    continue
-                # Not retryable, or last attempt — re-raise
-                logger.exception("GeminiClient: generation failed (attempt %d/%d): %s", attempt, max_attempts, name)
-                raise
-        # If we exhausted attempts, raise the last exception
-        if last_exc:
-            raise last_exc
-        raise RuntimeError("GeminiClient: failed to generate content for unknown reasons")
-
-
-def create_llm_client() -> LLMClient:
+                if config is not None:
+                    stream = self._client.models.generate_content_stream(model=self.model_name, contents=prompt, config=config)
+                else:
+                    stream = self._client.models.generate_content_stream(model=self.model_name, contents=prompt)
+                return "".join(chunk.text for chunk in stream if getattr(chunk, "text", None))
+            except AttributeError:
+                # SDK without a streaming endpoint
+                if config is not None:
+                    response = self._client.models.generate_content(model=self.model_name, contents=prompt, config=config)
+                else:
+                    response = self._client.models.generate_content(model=self.model_name, contents=prompt)
+                response_text = getattr(response, "text", None)
+                return response_text if response_text is not None else str(response)
+
+        if self._retry is not None:
+            text = self._retry(_call)()
+        else:
+            text = _retry_call(_call)
+        with self._memo_lock:
+            self._memo[memo_key] = text
+            if len(self._memo) > self._MEMO_MAX:
+                self._memo.popitem(last=False)
+        return text
+
+
+def create_llm_client(config: Optional[LLMConfig] = None) -> LLMClient:
     # Default to MockGemini for tests and local development. To use a real Gemini client,
-    # set USE_REAL_GEMINI=1 and provide GEMINI_API_KEY in the environment.
+    # set USE_REAL_GEMINI=1 and provide GEMINI_API_KEY in the environment, or pass an
+    # explicit request-scoped LLMConfig (preferred: no shared mutable environment).
+    if config is not None:
+        if config.provider == "gemini" and config.api_key:
+            try:
+                client = GeminiClient(api_key=config.api_key, model_name=config.model)
+                logger.info(f"GeminiClient created from config with model={client.model_name}")
+                return client
+            except Exception as exc:
+                logger.exception("Failed to initialize GeminiClient from config, falling back to MockGemini: %s", exc)
+                return MockGemini()
+        if config.provider == "vllm":
+            try:
+                client = LocalVLLMClient(model_name=config.model)
+                logger.info(f"LocalVLLMClient created from config with model={client.model_name}")
+                return client
+            except Exception as exc:
+                logger.exception("Failed to initialize LocalVLLMClient from config, falling back to MockGemini: %s", exc)
+                return MockGemini()
+        logger.info(f"Using MockGemini (config provider={config.provider})")
+        return MockGemini()
+
     use_real = os.environ.get("USE_REAL_GEMINI") in ("1", "true", "True")
     key_present = bool(os.environ.get("GEMINI_API_KEY"))
     logger.info(f"create_llm_client: USE_REAL_GEMINI={use_real}, GEMINI_API_KEY_present={key_present}")
-    
+
+    # Self-hosted continuous-batching backend, when explicitly requested
+    if os.environ.get("USE_LOCAL_VLLM") in ("1", "true", "True"):
+        try:
+            client = LocalVLLMClient()
+            logger.info(f"LocalVLLMClient created with model={client.model_name}")
+            return client
+        except Exception as exc:
+            logger.exception("Failed to initialize LocalVLLMClient, falling back: %s", exc)
+
     if use_real:
         if not key_present:
             logger.warning("USE_REAL_GEMINI requested but GEMINI_API_KEY missing; falling back to MockGemini")
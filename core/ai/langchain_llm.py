@@ -15,7 +15,7 @@ import logging
 import os
 from typing import Optional, List, Dict, Any
 
-from core.ai.gemini_wrapper import LLMClient
+from core.ai.gemini_wrapper import LLMClient, LLMConfig
 
 logger = logging.getLogger("cyberforge.ai.langchain")
 
@@ -121,13 +121,22 @@ def create_langchain_client(
     provider: str = "gemini",
     api_key: Optional[str] = None,
     model_name: Optional[str] = None,
+    config: Optional[LLMConfig] = None,
 ) -> LLMClient:
     """Factory: create a LangChain-backed LLMClient.
 
+    A request-scoped LLMConfig takes precedence over the environment so
+    concurrent requests never observe each other's provider or key.
     Falls back to LangChainMock when credentials are missing or init fails.
     """
-    use_real = os.environ.get("USE_REAL_GEMINI") in ("1", "true", "True")
-    key = api_key or os.environ.get("GEMINI_API_KEY", "")
+    if config is not None:
+        provider = config.provider
+        use_real = config.provider == "gemini" and bool(config.api_key)
+        key = config.api_key or ""
+        model_name = config.model or model_name
+    else:
+        use_real = os.environ.get("USE_REAL_GEMINI") in ("1", "true", "True")
+        key = api_key or os.environ.get("GEMINI_API_KEY", "")
 
     logger.info(
         "create_langchain_client: provider=%s, use_real=%s, key_present=%s",
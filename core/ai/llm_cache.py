@@ -0,0 +1,68 @@
+"""Persistent on-disk cache for LLM generations, keyed by prompt hash.
+
+Unlike the run-scoped caches in `semantic_cache`, this cache lives under the
+user cache directory and survives across runs and output dirs: iterative
+development with unchanged module specs skips the multi-second LLM round trip
+entirely. Opt-in via the CYBERFORGE_LLM_CACHE=1 environment variable so CI
+and tests keep exercising the real (mock) client.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger("cyberforge.ai.llm_cache")
+
+_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "cyberforge" / "llm"
+
+
+def _enabled() -> bool:
+    return os.environ.get("CYBERFORGE_LLM_CACHE") == "1"
+
+
+def disk_cached_generate(llm, prompt, ttl: int = 86400) -> str:
+    """Generate via `llm`, consulting the on-disk cache when enabled.
+
+    `prompt` may be a plain string or a PromptParts-style object; parts are
+    dispatched through llm.generate_parts so prefix-caching backends reuse
+    the prefill for the static prefix and only pay for the dynamic suffix.
+
+    Entries older than `ttl` seconds are regenerated. Writes go through a
+    temp file + os.replace so concurrent agents never observe a partial
+    entry.
+    """
+    text = prompt.text if hasattr(prompt, "static") else prompt
+
+    def _generate() -> str:
+        if hasattr(prompt, "static"):
+            return llm.generate_parts(prompt)
+        return llm.generate(prompt)
+
+    if not _enabled():
+        return _generate()
+
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cache_path = _CACHE_DIR / f"{key}.txt"
+    try:
+        if cache_path.exists() and (time.time() - cache_path.stat().st_mtime) < ttl:
+            return cache_path.read_text(encoding="utf-8")
+    except OSError as exc:
+        logger.warning("llm_cache: read failed for %s: %s", cache_path, exc)
+
+    generated = _generate()
+
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=_CACHE_DIR, suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(generated)
+        os.replace(tmp.name, cache_path)
+    except OSError as exc:
+        logger.warning("llm_cache: write failed for %s: %s", cache_path, exc)
+
+    return generated
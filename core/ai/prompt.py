@@ -1,35 +1,169 @@
 """Prompt loader and composer for agents.
 
 Prompts are versioned files under `prompts/` and are composed with the base prompt.
+
+Composed prompts are split into a stable static prefix (role, constraints, RAG
+context) and a dynamic suffix (module/MCU specifics) so LLM backends that
+support prefix caching (e.g. Gemini CachedContent) can reuse the prefill for
+the stable part across calls.
 """
 from __future__ import annotations
 
+import re
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List
 
 
+# Placeholders that vary per call; everything from the first of these onward
+# in a composed template is the non-cacheable dynamic suffix.
+_DYNAMIC_TOKENS = frozenset({"MODULE", "MCU", "BOARD_SPECS", "OPTIMIZATION", "MODULES"})
+
+# Every placeholder the templates use. Templates are tokenized once into
+# (literal, token) segments so composition is sequential StringIO writes
+# instead of repeated full-string scans and copies.
+_TOKEN_RE = re.compile(
+    r"<<(AGENT_ROLE|CONSTRAINTS|CODE_ARTIFACTS|CODE_FILES|MODULE|MCU|BOARD_SPECS|OPTIMIZATION|MODULES)>>"
+)
+
+
+def _segment_template(template: str) -> list:
+    """Tokenize a template into (literal, placeholder-name-or-None) segments."""
+    segments = []
+    pos = 0
+    for match in _TOKEN_RE.finditer(template):
+        segments.append((template[pos:match.start()], match.group(1)))
+        pos = match.end()
+    segments.append((template[pos:], None))
+    return segments
+
+
+def _compile_composer(segments: list):
+    """Compile segments into a closure mapping a values dict to (static, dynamic).
+
+    The placeholder set is fixed at import time and the split point between
+    the static prefix and dynamic suffix is a property of the template, so
+    each template gets a generated one-liner — literals baked in as
+    constants, placeholders as dict lookups — with no per-call scanning or
+    branching left at all. Compiled once per (agent, version) alongside the
+    template cache entry.
+    """
+    static_exprs: list = []
+    dynamic_exprs: list = []
+    exprs = static_exprs
+    for literal, token in segments:
+        if literal:
+            exprs.append(repr(literal))
+        if token is None:
+            continue
+        if exprs is static_exprs and token in _DYNAMIC_TOKENS:
+            exprs = dynamic_exprs
+        exprs.append(f"m[{token!r}]")
+
+    def _join(parts: list) -> str:
+        if not parts:
+            return "''"
+        if len(parts) == 1:
+            return parts[0]
+        return f"''.join(({', '.join(parts)}))"
+
+    namespace: dict = {}
+    exec(f"def _compose(m):\n    return ({_join(static_exprs)}, {_join(dynamic_exprs)})", namespace)
+    return namespace["_compose"]
+
+
+@dataclass
+class PromptParts:
+    """A composed prompt split into a cacheable static prefix and dynamic suffix.
+
+    `request_key` holds just the per-call placeholder values (module, MCU,
+    board specs, optimization, modules) — the part of the prompt that actually
+    identifies the request once all template text is stripped. The semantic
+    response cache matches on it; over the full text the template dominates.
+    """
+    static: str
+    dynamic: str
+    request_key: str = ""
+
+    @property
+    def text(self) -> str:
+        return self.static + self.dynamic
+
+
 class PromptLoader:
     def __init__(self, base_dir: Path):
         self.base_dir = base_dir
+        # (agent_name, version) -> (newest source mtime, concatenated
+        # template, compiled composer). compose() runs once per agent per
+        # module, so without this the base prompt is re-read, re-scanned,
+        # and re-split O(agents x modules) times per run.
+        self._cache: dict[tuple[str, str], tuple[float, str, object]] = {}
+
+    def _load_entry(self, agent_name: str, version: str) -> tuple[float, str, object]:
+        base_path = self.base_dir / "base_prompt.md"
+        specific_path = self.base_dir / f"{agent_name}_prompt_{version}.md"
+        mtime = max(base_path.stat().st_mtime, specific_path.stat().st_mtime)
+        key = (agent_name, version)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached
+        text = base_path.read_text() + "\n\n" + specific_path.read_text()
+        entry = (mtime, text, _compile_composer(_segment_template(text)))
+        self._cache[key] = entry
+        return entry
 
     def load(self, agent_name: str, version: str = "v1") -> str:
-        base = (self.base_dir / "base_prompt.md").read_text()
-        specific = (self.base_dir / f"{agent_name}_prompt_{version}.md").read_text()
-        return base + "\n\n" + specific
+        return self._load_entry(agent_name, version)[1]
 
     def compose(self, agent_name: str, constraints: str = "", rag_context: List[str] | None = None, module: dict | None = None, mcu: str = "", board_specs: str = "", optimization: str = "", modules: list = None) -> str:
-        prompt = self.load(agent_name)
+        return self.compose_parts(agent_name, constraints=constraints, rag_context=rag_context, module=module, mcu=mcu, board_specs=board_specs, optimization=optimization, modules=modules).text
+
+    def compose_parts(self, agent_name: str, constraints: str = "", rag_context: List[str] | None = None, module: dict | None = None, mcu: str = "", board_specs: str = "", optimization: str = "", modules: list = None) -> PromptParts:
+        """Compose a prompt and return it as (static prefix, dynamic suffix).
+
+        The static prefix is bit-identical across calls that share the same
+        template, constraints, and RAG context, which is what provider-side
+        prefix caches key on. All per-call substitutions land in the suffix.
+        """
+        return self.prepare_parts(agent_name, constraints=constraints, module=module, mcu=mcu, board_specs=board_specs, optimization=optimization, modules=modules).with_rag(rag_context)
+
+    def prepare_parts(self, agent_name: str, constraints: str = "", module: dict | None = None, mcu: str = "", board_specs: str = "", optimization: str = "", modules: list = None) -> "PendingPrompt":
+        """Render everything except the RAG context.
+
+        Callers that fetch RAG context concurrently (e.g. on an executor) can
+        do all template loading and substitution while retrieval is in flight,
+        then finish with `with_rag(rag_context)`.
+        """
+        composer = self._load_entry(agent_name, "v1")[2]
+        values = {
+            "AGENT_ROLE": agent_name,
+            "CONSTRAINTS": constraints,
+            "CODE_ARTIFACTS": "Check run_output_dir/module_code/",
+            "CODE_FILES": "Check run_output_dir/module_code/*/",
+            "MODULE": str(module) if module is not None else "",
+            "MCU": mcu,
+            "BOARD_SPECS": board_specs or f"Board: {mcu}",
+            "OPTIMIZATION": optimization,
+            "MODULES": str(modules) if modules is not None else "",
+        }
+        static, dynamic = composer(values)
+        request_key = "\n".join(
+            values[token] for token in ("MODULE", "MCU", "BOARD_SPECS", "OPTIMIZATION", "MODULES")
+        )
+        return PendingPrompt(static=static, dynamic=dynamic, request_key=request_key)
+
+
+@dataclass
+class PendingPrompt:
+    """A composed prompt awaiting only its RAG context substitution."""
+    static: str
+    dynamic: str
+    request_key: str = ""
+
+    def with_rag(self, rag_context: List[str] | None) -> PromptParts:
         rag_section = "\n---\n".join(rag_context or [])
-        module_section = str(module) if module is not None else ""
-        modules_section = str(modules) if modules is not None else ""
-        prompt = prompt.replace("<<AGENT_ROLE>>", agent_name)
-        prompt = prompt.replace("<<CONSTRAINTS>>", constraints)
-        prompt = prompt.replace("<<RAG_CONTEXT>>", rag_section)
-        prompt = prompt.replace("<<MODULE>>", module_section)
-        prompt = prompt.replace("<<MCU>>", mcu)
-        prompt = prompt.replace("<<BOARD_SPECS>>", board_specs or f"Board: {mcu}")
-        prompt = prompt.replace("<<OPTIMIZATION>>", optimization)
-        prompt = prompt.replace("<<MODULES>>", modules_section)
-        prompt = prompt.replace("<<CODE_ARTIFACTS>>", "Check run_output_dir/module_code/")
-        prompt = prompt.replace("<<CODE_FILES>>", "Check run_output_dir/module_code/*/")
-        return prompt
+        return PromptParts(
+            static=self.static.replace("<<RAG_CONTEXT>>", rag_section),
+            dynamic=self.dynamic.replace("<<RAG_CONTEXT>>", rag_section),
+            request_key=self.request_key,
+        )
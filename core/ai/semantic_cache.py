@@ -0,0 +1,205 @@
+"""Semantic response cache for LLM calls.
+
+Caches generated responses keyed by the composed prompt. Lookups succeed when a
+stored prompt is sufficiently similar (token-overlap similarity >= threshold),
+so near-identical runs (same MCU, optimization goal, slightly rephrased module
+lists) skip the LLM call entirely. Similarity is computed over the *dynamic*
+portion of a PromptParts only: the shared template dominates the full text and
+would make materially different requests (another MCU, another optimization
+goal) look near-identical. Plain-string prompts therefore only use the exact
+layer. Optionally persists entries to a sqlite sidecar so the cache survives
+across runs.
+
+The cache is attached to the execution context as `context.llm_cache`; agents
+treat it as optional so lightweight test contexts keep working without it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("cyberforge.ai.semantic_cache")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> frozenset:
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+
+def _prompt_key(prompt: str) -> str:
+    import hashlib
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ExactCache:
+    """Byte-identical prompt -> response cache.
+
+    Sub-millisecond blake2b lookup with zero false positives; sits in front of
+    the similarity-based SemanticCache for deterministic orchestrator restarts
+    where the composed prompt repeats exactly.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path
+        self._entries: dict = {}
+        if db_path is not None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS exact_cache (key TEXT PRIMARY KEY, response TEXT)"
+                    )
+                    for key, response in conn.execute("SELECT key, response FROM exact_cache"):
+                        self._entries[key] = response
+            except Exception as exc:
+                logger.warning("ExactCache: failed to load persisted cache: %s", exc)
+                self.db_path = None
+
+    def get(self, prompt: str) -> Optional[str]:
+        return self._entries.get(_prompt_key(prompt))
+
+    def put(self, prompt: str, response: str) -> None:
+        key = _prompt_key(prompt)
+        self._entries[key] = response
+        if self.db_path is not None:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO exact_cache (key, response) VALUES (?, ?)",
+                        (key, response),
+                    )
+            except Exception as exc:
+                logger.warning("ExactCache: failed to persist entry: %s", exc)
+
+
+class SemanticCache:
+    """Prompt -> response cache with similarity-based lookup.
+
+    Similarity is Jaccard overlap of lowercased word tokens. A hit requires
+    similarity >= `threshold` (default 0.95). Callers must key entries on the
+    dynamic portion of the prompt (see `lookup_cached`/`store_cached`): over
+    the full composed text the static template swamps the token sets and
+    different requests score above any workable threshold.
+    """
+
+    def __init__(self, threshold: float = 0.95, db_path: Optional[Path] = None):
+        self.threshold = threshold
+        self.db_path = db_path
+        self._entries: List[Tuple[frozenset, str, str]] = []
+        if db_path is not None:
+            self._load_persisted()
+
+    def _load_persisted(self) -> None:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (prompt TEXT, response TEXT)"
+                )
+                for prompt, response in conn.execute("SELECT prompt, response FROM llm_cache"):
+                    self._entries.append((_tokenize(prompt), prompt, response))
+        except Exception as exc:
+            logger.warning("SemanticCache: failed to load persisted cache: %s", exc)
+            self.db_path = None
+
+    def _similarity(self, a: frozenset, b: frozenset) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Return a cached response for a sufficiently similar prompt, else None."""
+        tokens = _tokenize(prompt)
+        best_score, best_response = 0.0, None
+        for entry_tokens, _entry_prompt, response in self._entries:
+            score = self._similarity(tokens, entry_tokens)
+            if score > best_score:
+                best_score, best_response = score, response
+        if best_score >= self.threshold:
+            logger.debug("SemanticCache: hit (similarity=%.3f)", best_score)
+            return best_response
+        return None
+
+    def put(self, prompt: str, response: str) -> None:
+        self._entries.append((_tokenize(prompt), prompt, response))
+        if self.db_path is not None:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "INSERT INTO llm_cache (prompt, response) VALUES (?, ?)",
+                        (prompt, response),
+                    )
+            except Exception as exc:
+                logger.warning("SemanticCache: failed to persist entry: %s", exc)
+
+
+def _cache_texts(prompt) -> Tuple[str, Optional[str]]:
+    """Split a prompt into (exact_key_text, similarity_text).
+
+    The exact layer keys on the full composed text (zero false positives).
+    The semantic layer only sees the request_key of a PromptParts — the bare
+    per-call placeholder values, with all template text stripped; for a plain
+    string there is no way to separate out the template, so similarity
+    matching is disabled (None) rather than risking template-dominated false
+    hits.
+    """
+    if hasattr(prompt, "static"):
+        return prompt.text, getattr(prompt, "request_key", "") or None
+    return prompt, None
+
+
+def lookup_cached(context, prompt) -> Optional[str]:
+    """Layered cache lookup: exact hash match first, then semantic similarity.
+
+    `prompt` may be a composed string or a PromptParts pair.
+    """
+    text, sim_text = _cache_texts(prompt)
+    exact = getattr(context, "exact_cache", None)
+    if exact is not None:
+        cached = exact.get(text)
+        if cached is not None:
+            return cached
+    cache = getattr(context, "llm_cache", None)
+    if cache is not None and sim_text is not None:
+        return cache.get(sim_text)
+    return None
+
+
+def store_cached(context, prompt, response: str) -> None:
+    """Store a generated response in every cache layer attached to the context."""
+    text, sim_text = _cache_texts(prompt)
+    exact = getattr(context, "exact_cache", None)
+    if exact is not None:
+        exact.put(text, response)
+    cache = getattr(context, "llm_cache", None)
+    if cache is not None and sim_text is not None:
+        cache.put(sim_text, response)
+
+
+def cached_generate(context, prompt) -> str:
+    """Generate via `context.llm`, consulting `context.llm_cache` when present.
+
+    Shared helper for agents: on a cache hit the LLM is skipped entirely; on a
+    miss the generated text is stored before being returned. Accepts either a
+    plain prompt string or a `PromptParts` pair, in which case the backend's
+    prefix-cached `generate_parts` path is used on a miss.
+    """
+    is_parts = hasattr(prompt, "static")
+    text = prompt.text if is_parts else prompt
+
+    def _generate():
+        if is_parts and hasattr(context.llm, "generate_parts"):
+            return context.llm.generate_parts(prompt)
+        return context.llm.generate(text)
+
+    cached = lookup_cached(context, prompt)
+    if cached is not None:
+        return cached
+    generated = _generate()
+    store_cached(context, prompt, generated)
+    return generated
@@ -14,15 +14,144 @@ from __future__ import annotations
 
 import json
 import logging
+import mmap
+import os
 import uuid
-from dataclasses import asdict, dataclass
-from datetime import datetime
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
+try:  # optional fast JSON encoder
+    import orjson
+except ImportError:
+    orjson = None
 
-@dataclass
+# Direct-I/O path for large artifact bodies: generated files are written once
+# and rarely read back, so bypassing the page cache avoids evicting hot data
+# and keeps write latency predictable. O_DIRECT requires 512B/4KiB-aligned
+# buffers, offsets, and lengths; 4 KiB satisfies all common block sizes.
+_DIRECT_IO_THRESHOLD = 64 * 1024
+_DIRECT_IO_ALIGN = 4096
+_O_DIRECT = getattr(os, "O_DIRECT", 0)  # 0 on platforms without it
+
+
+def _write_artifact_bytes(path: Path, data: bytes) -> None:
+    """Atomically write an artifact payload, using O_DIRECT for multi-64KiB bodies.
+
+    The payload lands in a sibling .tmp file that is os.replace()d into
+    place, so readers never observe a torn artifact. Large payloads are
+    staged in a page-aligned mmap buffer, padded to the alignment, written
+    in one pwrite, and the file truncated back to the real length. Small
+    payloads, non-Linux platforms, and filesystems that reject O_DIRECT all
+    take the ordinary buffered path.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    if _O_DIRECT == 0 or len(data) < _DIRECT_IO_THRESHOLD:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return
+    try:
+        padded = (len(data) + _DIRECT_IO_ALIGN - 1) // _DIRECT_IO_ALIGN * _DIRECT_IO_ALIGN
+        buf = mmap.mmap(-1, padded)
+        try:
+            buf.write(data)
+            fd = os.open(tmp, _O_DIRECT | os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o644)
+            try:
+                os.pwrite(fd, buf, 0)
+                os.ftruncate(fd, len(data))
+            finally:
+                os.close(fd)
+        finally:
+            buf.close()
+    except OSError as exc:
+        logging.debug("Direct I/O write failed for %s (%s); using buffered write", path, exc)
+        tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _link_latest(file_path: Path, latest_path: Path) -> None:
+    """Expose file_path under a stable 'latest' alias without rewriting bytes.
+
+    Hardlink when the filesystem allows it (metadata-only), relative symlink
+    otherwise; both replace a stale alias from a previous run.
+    """
+    latest_path.unlink(missing_ok=True)
+    try:
+        os.link(file_path, latest_path)
+    except OSError:
+        latest_path.symlink_to(file_path.name)
+
+
+_io_pool = None
+
+
+def _get_io_pool(context: Any):
+    """Executor for overlapped artifact writes.
+
+    Prefers the run-wide executor on the execution context; falls back to a
+    small module-level pool so thin test contexts still work.
+    """
+    pool = getattr(context, "executor", None)
+    if pool is not None:
+        return pool
+    global _io_pool
+    if _io_pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _io_pool = ThreadPoolExecutor(max_workers=4)
+    return _io_pool
+
+
+def write_artifact_async(context: Any, *args, **kwargs):
+    """Submit a write_artifact call to the shared I/O pool.
+
+    Returns a Future resolving to the artifact path, letting agents overlap
+    disk writes with further composition work and collect paths at the end
+    of execute().
+    """
+    return _get_io_pool(context).submit(write_artifact, context, *args, **kwargs)
+
+
+def _dump_json_bytes(data: Any) -> bytes:
+    """Serialize to indented JSON, via orjson when available (~5-10x faster)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def _dump_meta_bytes(meta: "ArtifactMetadata") -> bytes:
+    """Serialize a metadata sidecar to indented JSON bytes.
+
+    orjson handles dataclasses natively; the stdlib fallback goes through
+    to_dict(), a flat field copy without asdict()'s recursive descent.
+    """
+    if orjson is not None:
+        return orjson.dumps(meta, option=orjson.OPT_INDENT_2)
+    return json.dumps(meta.to_dict(), indent=2).encode("utf-8")
+
+
+def _new_artifact_ids() -> tuple:
+    """Return (artifact_id, iso_timestamp, filesystem-safe timestamp).
+
+    A single clock read feeds both timestamp renderings; the old per-field
+    utcnow() calls could straddle a second boundary and tag the metadata and
+    filename with different times. uuid4().hex drops the dashes for shorter
+    filenames.
+    """
+    now = datetime.now(timezone.utc)
+    iso_ts = now.isoformat().replace("+00:00", "Z")
+    safe_ts = now.strftime("%Y%m%dT%H%M%SZ")
+    return uuid.uuid4().hex, iso_ts, safe_ts
+
+
+@dataclass(slots=True)
 class ArtifactMetadata:
+    """Sidecar metadata for a written artifact.
+
+    ``extra`` holds the caller's metadata dict by reference (no defensive
+    copy); callers must not mutate it after passing it to a write_* function.
+    """
     artifact_id: str
     agent_id: str
     artifact_type: str
@@ -34,6 +163,21 @@ class ArtifactMetadata:
     sub_artifacts: Optional[List[str]] = None  # For multi-file tracking
     extra: Optional[Dict[str, Any]] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat field dict; fields are already JSON-ready, so no deep copy."""
+        return {
+            "artifact_id": self.artifact_id,
+            "agent_id": self.agent_id,
+            "artifact_type": self.artifact_type,
+            "module_id": self.module_id,
+            "prompt_version": self.prompt_version,
+            "requirement_id": self.requirement_id,
+            "timestamp": self.timestamp,
+            "artifact_format": self.artifact_format,
+            "sub_artifacts": self.sub_artifacts,
+            "extra": self.extra,
+        }
+
 
 def write_artifact(context: Any, agent_id: str, artifact_type: str, content: str, 
                    metadata: Optional[Dict] = None, module_id: Optional[str] = None, 
@@ -49,14 +193,12 @@ def write_artifact(context: Any, agent_id: str, artifact_type: str, content: str
     out_dir = context.run_output_dir / artifact_type
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    artifact_id = str(uuid.uuid4())
-    timestamp_iso = datetime.utcnow().isoformat() + "Z"
-    timestamp_safe = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    artifact_id, timestamp_iso, timestamp_safe = _new_artifact_ids()
     safe_agent_id = agent_id.replace(":", "_")
     filename = f"{timestamp_safe}_{safe_agent_id}_{artifact_id}.{extension}"
     file_path = out_dir / filename
 
-    file_path.write_text(content, encoding="utf-8")
+    _write_artifact_bytes(file_path, content.encode("utf-8"))
 
     meta = ArtifactMetadata(
         artifact_id=artifact_id,
@@ -67,23 +209,70 @@ def write_artifact(context: Any, agent_id: str, artifact_type: str, content: str
         requirement_id=metadata.get("requirement_id") if metadata else None,
         timestamp=timestamp_iso,
         artifact_format="text",
-        extra={**(metadata or {})},
+        extra=metadata if metadata else None,
     )
     meta_path = file_path.with_suffix(".meta.json")
-    meta_path.write_text(json.dumps(asdict(meta), indent=2), encoding="utf-8")
+    meta_path.write_bytes(_dump_meta_bytes(meta))
 
     # For quality reports and build logs, also create a standardized "latest" copy
     if agent_id == "quality_agent" and artifact_type == "reports":
         try:
-            latest_path = out_dir / "quality_report_latest.json"
-            latest_path.write_text(content, encoding="utf-8")
+            _link_latest(file_path, out_dir / "quality_report_latest.json")
         except Exception as e:
             logging.warning(f"Could not create quality_report_latest.json: {e}")
 
     return file_path
 
 
-def write_modular_code(context: Any, agent_id: str, module_id: str, 
+@contextmanager
+def write_artifact_stream(context: Any, agent_id: str, artifact_type: str,
+                          metadata: Optional[Dict] = None, module_id: Optional[str] = None,
+                          prompt_version: str = "v1", extension: str = "txt"):
+    """Streaming variant of write_artifact.
+
+    Yields (path, writer) so callers can write content incrementally (e.g.
+    token chunks from a streaming LLM response) instead of buffering the full
+    text first. Chunks land in a sibling .tmp file that is os.replace()d into
+    place when the block exits cleanly — matching _write_artifact_bytes — so
+    a stream that raises mid-iteration leaves neither a partial artifact nor
+    an artifact without its metadata sidecar.
+    """
+    resource = artifact_type if not module_id else f"{artifact_type}:{module_id}"
+    context.mcp.check_write(agent_id, resource, metadata)
+
+    out_dir = context.run_output_dir / artifact_type
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    artifact_id, timestamp_iso, timestamp_safe = _new_artifact_ids()
+    safe_agent_id = agent_id.replace(":", "_")
+    filename = f"{timestamp_safe}_{safe_agent_id}_{artifact_id}.{extension}"
+    file_path = out_dir / filename
+
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as writer:
+            yield file_path, writer
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, file_path)
+
+    meta = ArtifactMetadata(
+        artifact_id=artifact_id,
+        agent_id=agent_id,
+        artifact_type=artifact_type,
+        module_id=module_id,
+        prompt_version=prompt_version,
+        requirement_id=metadata.get("requirement_id") if metadata else None,
+        timestamp=timestamp_iso,
+        artifact_format="text",
+        extra=metadata if metadata else None,
+    )
+    meta_path = file_path.with_suffix(".meta.json")
+    meta_path.write_bytes(_dump_meta_bytes(meta))
+
+
+def write_modular_code(context: Any, agent_id: str, module_id: str,
                        header_code: str, source_code: str,
                        metadata: Optional[Dict] = None, 
                        prompt_version: str = "v1") -> Dict[str, Path]:
@@ -105,21 +294,30 @@ def write_modular_code(context: Any, agent_id: str, module_id: str,
     out_dir = context.run_output_dir / artifact_type / module_id
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    artifact_id = str(uuid.uuid4())
-    timestamp_iso = datetime.utcnow().isoformat() + "Z"
-    timestamp_safe = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    artifact_id, timestamp_iso, timestamp_safe = _new_artifact_ids()
     safe_agent_id = agent_id.replace(":", "_")
     
-    # Create header file
     header_filename = f"{module_id}.h"
     header_path = out_dir / header_filename
-    header_path.write_text(header_code, encoding="utf-8")
-    
-    # Create source file
     source_filename = f"{module_id}.c"
     source_path = out_dir / source_filename
-    source_path.write_text(source_code, encoding="utf-8")
-    
+
+    # Header and source are independent, so on opted-in environments the two
+    # writes overlap on the shared I/O pool (the GIL is released during the
+    # underlying write); the default stays serial for predictable test runs
+    if os.environ.get("CYBERFORGE_PARALLEL_IO") in ("1", "true", "True"):
+        pool = _get_io_pool(context)
+        futures = [
+            pool.submit(header_path.write_text, header_code, encoding="utf-8"),
+            pool.submit(source_path.write_text, source_code, encoding="utf-8"),
+        ]
+        for fut in futures:
+            fut.result()
+    else:
+        header_path.write_text(header_code, encoding="utf-8")
+        source_path.write_text(source_code, encoding="utf-8")
+
+
     # Create shared metadata for both files
     meta = ArtifactMetadata(
         artifact_id=artifact_id,
@@ -131,11 +329,11 @@ def write_modular_code(context: Any, agent_id: str, module_id: str,
         timestamp=timestamp_iso,
         artifact_format="multi-file",
         sub_artifacts=[header_filename, source_filename],
-        extra={**(metadata or {})},
+        extra=metadata if metadata else None,
     )
     
     meta_path = out_dir / f"_artifact_{artifact_id}.meta.json"
-    meta_path.write_text(json.dumps(asdict(meta), indent=2), encoding="utf-8")
+    meta_path.write_bytes(_dump_meta_bytes(meta))
     
     return {
         "header": header_path,
@@ -156,15 +354,13 @@ def write_json_artifact(context: Any, agent_id: str, artifact_type: str,
     out_dir = context.run_output_dir / artifact_type
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    artifact_id = str(uuid.uuid4())
-    timestamp_iso = datetime.utcnow().isoformat() + "Z"
-    timestamp_safe = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    artifact_id, timestamp_iso, timestamp_safe = _new_artifact_ids()
     safe_agent_id = agent_id.replace(":", "_")
     filename = f"{timestamp_safe}_{safe_agent_id}_{artifact_id}.json"
     file_path = out_dir / filename
 
-    # Write JSON data
-    file_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    # Write JSON data (atomic, serialized once — the latest alias links to it)
+    _write_artifact_bytes(file_path, _dump_json_bytes(data))
 
     meta = ArtifactMetadata(
         artifact_id=artifact_id,
@@ -175,16 +371,16 @@ def write_json_artifact(context: Any, agent_id: str, artifact_type: str,
         requirement_id=metadata.get("requirement_id") if metadata else None,
         timestamp=timestamp_iso,
         artifact_format="json",
-        extra={**(metadata or {})},
+        extra=metadata if metadata else None,
     )
     meta_path = file_path.with_suffix(".meta.json")
-    meta_path.write_text(json.dumps(asdict(meta), indent=2), encoding="utf-8")
+    meta_path.write_bytes(_dump_meta_bytes(meta))
 
-    # For build logs, also create a standardized "build_log.json" copy
+    # For build logs, also expose a standardized "build_log.json" alias
     if agent_id == "build_agent" and artifact_type == "build_log":
         try:
             latest_path = out_dir / "build_log.json"
-            latest_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            _link_latest(file_path, latest_path)
             logging.info(f"Created standardized build log: {latest_path}")
         except Exception as e:
             logging.warning(f"Could not create build_log.json: {e}")
@@ -212,9 +408,7 @@ def write_single_file_code(context: Any, agent_id: str, project_name: str,
     out_dir = context.run_output_dir / artifact_type
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    artifact_id = str(uuid.uuid4())
-    timestamp_iso = datetime.utcnow().isoformat() + "Z"
-    timestamp_safe = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    artifact_id, timestamp_iso, timestamp_safe = _new_artifact_ids()
     
     # Use project name for Arduino files
     filename = f"{project_name}.{extension}"
@@ -233,10 +427,10 @@ def write_single_file_code(context: Any, agent_id: str, project_name: str,
         requirement_id=metadata.get("requirement_id") if metadata else None,
         timestamp=timestamp_iso,
         artifact_format="single_file",
-        extra={**(metadata or {})},
+        extra=metadata if metadata else None,
     )
     
     meta_path = file_path.with_suffix(f".{extension}.meta.json")
-    meta_path.write_text(json.dumps(asdict(meta), indent=2), encoding="utf-8")
+    meta_path.write_bytes(_dump_meta_bytes(meta))
     
     return file_path
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""Non-blocking logging setup: agents log to an in-process queue.
+
+`logging.info(...)` normally writes synchronously through the handler lock,
+so a slow stderr/file handler can stall an agent mid-execute. Routing all
+records through a QueueHandler makes emission a lock-free queue put; a
+background QueueListener drains the queue into the original handlers.
+Agents keep using plain `logging.*` calls unchanged.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup_async_logging() -> None:
+    """Replace root handlers with a queue; drain them on a background thread.
+
+    Idempotent — safe to call from both the CLI and the API entrypoints.
+    Registered with atexit so buffered records are flushed on shutdown.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    existing = root.handlers[:]
+    if not existing:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *existing, respect_handler_level=True)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener.start()
+    atexit.register(shutdown_async_logging)
+
+
+def shutdown_async_logging() -> None:
+    """Stop the listener, flushing any queued records to the real handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
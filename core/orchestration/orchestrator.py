@@ -5,15 +5,45 @@ from __future__ import annotations
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Dict, List
 from pathlib import Path
 from datetime import datetime
 
-import networkx as nx
+from core.mcp.mcp import MCP, MCPViolation
+from core.rag.rag import RAG
+from core.ai.gemini_wrapper import create_llm_client
+from core.ai.prompt import PromptLoader
+from agents.architecture_agent import ArchitectureAgent
+from agents.code_agent import CodeAgent
+from agents.test_agent import TestAgent
+from agents.quality_agent import QualityAgent
+from agents.build_agent import BuildAgent
 
 logger = logging.getLogger("cyberforge.orchestrator")
 
+# Deterministic ordering enforced here — architecture -> code -> test -> quality -> build.
+# The pipeline is a static 5-node chain known at import time, so a tuple
+# replaces the per-instance networkx DiGraph + topological sort (and the
+# networkx import cost on cold start).
+_PIPELINE = (
+    "architecture_agent",
+    "code_agents",
+    "test_agent",
+    "quality_agent",
+    "build_agent",
+)
+
+# Folder-name sanitization table: one translate() pass instead of chained
+# replace() scans; extend here as more characters need escaping.
+_FOLDER_TRANS = str.maketrans({" ": "_", "-": "_"})
+
+# Cap on concurrently executing per-module code agents; bounds LLM/API
+# pressure the same way a bounded semaphore would in an async pipeline.
+# Tune per provider rate tier via CYBERFORGE_MAX_CONCURRENT.
+_MODULE_CONCURRENCY = int(os.environ.get("CYBERFORGE_MAX_CONCURRENT", "5"))
+
 
 @dataclass
 class OrchestrationResult:
@@ -31,7 +61,7 @@ class ExecutionContext:
         self.output_dir = output_dir
         self.run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
         # Use project name as folder if provided, otherwise use timestamp
-        folder_name = project_name.replace(" ", "_").replace("-", "_") if project_name else self.run_id
+        folder_name = project_name.translate(_FOLDER_TRANS) if project_name else self.run_id
         self.run_output_dir = Path(output_dir) / "runs" / folder_name
         self.run_output_dir.mkdir(parents=True, exist_ok=True)
         # Store MCU and board specifications for agent access
@@ -39,13 +69,26 @@ class ExecutionContext:
         self.target_mcu = self.payload.get("target_mcu", "Unknown")
         self.optimization_goal = self.payload.get("optimization_goal", "balanced")
         self.modules = self.payload.get("modules", [])
+        # Shared semantic LLM cache — persisted per output dir so repeated runs
+        # with near-identical inputs skip the LLM call
+        from core.ai.semantic_cache import ExactCache, SemanticCache
+        self.llm_cache = SemanticCache(db_path=Path(output_dir) / "llm_cache.sqlite")
+        # Exact-hash layer consulted before the semantic cache: byte-identical
+        # composed prompts (deterministic restarts) skip even the similarity scan
+        self.exact_cache = ExactCache(db_path=Path(output_dir) / "llm_exact_cache.sqlite")
+        # Shared executor for agents that overlap independent work
+        # (e.g. RAG retrieval concurrent with prompt composition)
+        self.executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        # Reranker narrows wide RAG candidate sets to the densest chunks
+        from core.rag.rag import Reranker
+        self.reranker = Reranker()
+        # Run-wide provider-side KV cache handle, when the backend created one
+        self.shared_cache_handle = getattr(llm, "_shared_cache", None)
 
 
 class Orchestrator:
-    def __init__(self, input_payload: Dict[str, Any], agent_factories: Dict[str, any] | None = None, mcp_role_permissions: Dict[str, set] | None = None, output_dir: str = "output", run_id: str | None = None, use_real_gemini: bool = False):
+    def __init__(self, input_payload: Dict[str, Any], agent_factories: Dict[str, any] | None = None, mcp_role_permissions: Dict[str, set] | None = None, output_dir: str = "output", run_id: str | None = None, use_real_gemini: bool = False, llm_config: "LLMConfig" = None):
         self.payload = input_payload
-        self.graph = nx.DiGraph()
-        self._build_pipeline()
         # Allow tests to inject fake agents
         self.agent_factories = agent_factories or {}
         # Allow injection of custom MCP role permissions for tests
@@ -53,183 +96,174 @@ class Orchestrator:
         self.output_dir = output_dir
         self.run_id = run_id
         self.use_real_gemini = use_real_gemini
+        # Request-scoped LLM settings; when provided, the env-flag path below
+        # is skipped entirely so concurrent runs cannot race on os.environ
+        self.llm_config = llm_config
+
+    @property
+    def graph(self):
+        """Pipeline DAG, built on demand (only visualization needs it)."""
+        import networkx as nx
+        g = nx.DiGraph()
+        for i in range(len(_PIPELINE) - 1):
+            g.add_edge(_PIPELINE[i], _PIPELINE[i + 1])
+        return g
+
+    def _invoke(self, mcp: "MCP", agent: Any, ctx: ExecutionContext, payload: Dict[str, Any], details: Dict[str, Any]) -> "OrchestrationResult | None":
+        """Run one agent under MCP, recording its result.
 
-    def _build_pipeline(self) -> None:
-        # Deterministic ordering enforced here — architecture -> code -> test -> quality -> build
-        steps = [
-            "architecture_agent",
-            "code_agents",
-            "test_agent",
-            "quality_agent",
-            "build_agent",
-        ]
-        for i in range(len(steps) - 1):
-            self.graph.add_edge(steps[i], steps[i + 1])
+        Returns a failure OrchestrationResult to propagate, or None on
+        success — the single code path for the check_run/execute/violation
+        pattern every pipeline step shares.
+        """
+        try:
+            mcp.check_run(agent.agent_id)
+            res = agent.execute(ctx, payload)
+            details[agent.agent_id] = res
+            if not res.success:
+                return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
+        except MCPViolation as mv:
+            logger.error("MCP violation during %s: %s", agent.agent_id, mv)
+            return OrchestrationResult(success=False, message=str(mv), details=details)
+        return None
 
     def run(self) -> OrchestrationResult:
         logger.info("Orchestration: starting run")
-        # Lazy imports to avoid top-level heavy deps during unit tests
-        from core.mcp.mcp import MCP, MCPViolation
-        from core.rag.rag import RAG
-        from core.ai.gemini_wrapper import create_llm_client
-        from core.ai.prompt import PromptLoader
-        from agents.architecture_agent import ArchitectureAgent
-        from agents.code_agent import CodeAgent
-        from agents.test_agent import TestAgent
-        from agents.quality_agent import QualityAgent
-        from agents.build_agent import BuildAgent
-
-        # Set up LLM provider BEFORE creating the client
-        if self.use_real_gemini:
-            os.environ["USE_REAL_GEMINI"] = "1"
-            logger.info("Orchestrator.run(): SET USE_REAL_GEMINI=1 (Gemini requested)")
-        else:
-            os.environ["USE_REAL_GEMINI"] = "0"
-            logger.info("Orchestrator.run(): SET USE_REAL_GEMINI=0 (Mock requested)")
+        # Set up LLM provider BEFORE creating the client. The env-flag path is
+        # legacy; callers passing llm_config avoid the shared-environment race.
+        if self.llm_config is None:
+            if self.use_real_gemini:
+                os.environ["USE_REAL_GEMINI"] = "1"
+                logger.info("Orchestrator.run(): SET USE_REAL_GEMINI=1 (Gemini requested)")
+            else:
+                os.environ["USE_REAL_GEMINI"] = "0"
+                logger.info("Orchestrator.run(): SET USE_REAL_GEMINI=0 (Mock requested)")
 
         # Get project root directory (2 levels up from this file)
         project_root = Path(__file__).parent.parent.parent
-        
+
+        architecture_only = bool(self.payload.get("architecture_only"))
+
         mcp = MCP(audit_log=Path(self.output_dir) / "mcp_audit.log", role_permissions=self._mcp_role_permissions)
         rag = RAG(project_root / "rag_docs")
-        
-        logger.info(f"About to create LLM client - USE_REAL_GEMINI={os.environ.get('USE_REAL_GEMINI')}, GEMINI_API_KEY_present={bool(os.environ.get('GEMINI_API_KEY'))}")
-        llm = create_llm_client()
+
+        llm = create_llm_client(self.llm_config)
         logger.info(f"LLM client created: {type(llm).__name__}")
         prompt_loader = PromptLoader(project_root / "prompts")
+
+        # Prefill the shared system instructions + RAG corpus once per run so
+        # every agent call only pays for its dynamic delta. A single-step
+        # architecture-only run cannot amortize the corpus upload, so skip it.
+        if not architecture_only and hasattr(llm, "create_shared_cache"):
+            try:
+                base_prompt = (project_root / "prompts" / "base_prompt.md").read_text()
+                corpus = [doc["content"] for doc in rag.doc_cache.values()]
+                llm.create_shared_cache(system_instruction=base_prompt, contents=corpus)
+            except Exception as exc:
+                logger.warning("Shared LLM cache setup failed: %s", exc)
         run_id = self.run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
         project_name = self.payload.get("project_name")
         ctx = ExecutionContext(mcp=mcp, rag=rag, llm=llm, prompt_loader=prompt_loader, output_dir=self.output_dir, run_id=run_id, project_name=project_name, payload=self.payload)
 
         details: Dict[str, Any] = {}
-        architecture_only = bool(self.payload.get("architecture_only"))
+
+        # Dispatch table for the single-agent steps; code_agents is the one
+        # step with its own fan-out logic and keeps a dedicated handler
+        single_agent_steps = {
+            "architecture_agent": ArchitectureAgent,
+            "test_agent": TestAgent,
+            "quality_agent": QualityAgent,
+            "build_agent": BuildAgent,
+        }
 
         try:
-            for node in nx.topological_sort(self.graph):
+            for node in _PIPELINE:
+                if architecture_only and node != "architecture_agent":
+                    logger.info("Architecture-only mode: stopping before %s", node)
+                    break
                 logger.info("Running step: %s", node)
-                if node == "architecture_agent":
-                    factory = self.agent_factories.get("architecture_agent", ArchitectureAgent)
-                    agent = factory()
-                    try:
-                        mcp.check_run(agent.agent_id)
-                        res = agent.execute(ctx, self.payload)
-                        details[agent.agent_id] = res
-                        if not res.success:
-                            return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                    except MCPViolation as mv:
-                        logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                        return OrchestrationResult(success=False, message=str(mv), details=details)
-
-                elif node == "code_agents":
-                    if architecture_only:
-                        logger.info("Architecture-only mode: skipping code agents")
-                        break
-                    
-                    # Determine code generation strategy based on MCU hardware
-                    from agents.code_agent import CodeAgent as CodeAgentClass
-                    target_mcu = self.payload.get("target_mcu", "").lower()
-                    mcu_format = CodeAgentClass.determine_mcu_format(target_mcu)
-                    is_single_file = mcu_format["is_single_file"]
-                    framework = mcu_format["framework"]
-                    
-                    modules = self.payload.get("modules", [])
-                    
-                    if is_single_file:
-                        # Single-file firmware (Arduino, ESP32-Arduino, RP2040, etc.)
-                        logger.info(f"Single-file MCU detected ({framework}): generating unified firmware file")
-                        
-                        factory = self.agent_factories.get("code_agent", CodeAgent)
-                        project_name = self.payload.get("project_name", "firmware")
-                        agent = factory("unified_firmware")
-                        
-                        try:
-                            mcp.check_run(agent.agent_id)
-                            # Pass ALL modules and hardware context
-                            unified_input = {
-                                "id": project_name.replace(" ", "_"),
-                                "name": project_name,
-                                "type": "unified",
-                                "target_mcu": self.payload.get("target_mcu"),
-                                "modules": modules,
-                                "all_modules": modules,
-                                "project_name": project_name
-                            }
-                            res = agent.execute(ctx, unified_input)
-                            details[agent.agent_id] = res
-                            if not res.success:
-                                return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                        except MCPViolation as mv:
-                            logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                            return OrchestrationResult(success=False, message=str(mv), details=details)
-                    else:
-                        # Modular firmware (STM32, nRF52, PIC32, etc.)
-                        logger.info(f"Modular MCU detected ({framework}): generating per-module code")
-                        for mod in modules:
-                            module_id = mod.get("id")
-                            if not module_id:
-                                logger.warning("Module missing 'id' field, skipping: %s", mod)
-                                continue
-                            factory = self.agent_factories.get("code_agent", CodeAgent)
-                            agent = factory(module_id)
-                            try:
-                                mcp.check_run(agent.agent_id)
-                                res = agent.execute(ctx, mod)
-                                details[agent.agent_id] = res
-                                if not res.success:
-                                    return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                            except MCPViolation as mv:
-                                logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                                return OrchestrationResult(success=False, message=str(mv), details=details)
-
-                elif node == "test_agent":
-                    if architecture_only:
-                        logger.info("Architecture-only mode: skipping test agent")
-                        break
-                    factory = self.agent_factories.get("test_agent", TestAgent)
-                    agent = factory()
-                    try:
-                        mcp.check_run(agent.agent_id)
-                        res = agent.execute(ctx, self.payload)
-                        details[agent.agent_id] = res
-                        if not res.success:
-                            return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                    except MCPViolation as mv:
-                        logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                        return OrchestrationResult(success=False, message=str(mv), details=details)
-
-                elif node == "quality_agent":
-                    if architecture_only:
-                        logger.info("Architecture-only mode: skipping quality agent")
-                        break
-                    factory = self.agent_factories.get("quality_agent", QualityAgent)
-                    agent = factory()
-                    try:
-                        mcp.check_run(agent.agent_id)
-                        res = agent.execute(ctx, self.payload)
-                        details[agent.agent_id] = res
-                        if not res.success:
-                            return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                    except MCPViolation as mv:
-                        logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                        return OrchestrationResult(success=False, message=str(mv), details=details)
-
-                elif node == "build_agent":
-                    if architecture_only:
-                        logger.info("Architecture-only mode: skipping build agent")
-                        break
-                    factory = self.agent_factories.get("build_agent", BuildAgent)
-                    agent = factory()
-                    try:
-                        mcp.check_run(agent.agent_id)
-                        res = agent.execute(ctx, self.payload)
-                        details[agent.agent_id] = res
-                        if not res.success:
-                            return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
-                    except MCPViolation as mv:
-                        logger.error("MCP violation during %s: %s", agent.agent_id, mv)
-                        return OrchestrationResult(success=False, message=str(mv), details=details)
+                if node == "code_agents":
+                    failure = self._run_code_agents(mcp, ctx, details)
+                else:
+                    factory = self.agent_factories.get(node, single_agent_steps[node])
+                    failure = self._invoke(mcp, factory(), ctx, self.payload, details)
+                if failure is not None:
+                    return failure
 
             return OrchestrationResult(success=True, message="All steps executed", details=details)
         except Exception as exc:
             logger.exception("Orchestration failed")
             return OrchestrationResult(success=False, message=str(exc), details=details)
+        finally:
+            # Flush the summarized audit entry for repeated run checks
+            mcp.finalize()
+            # The context's shared executor is per-run; without this its
+            # worker threads outlive the run and accumulate in long-lived
+            # API processes
+            ctx.executor.shutdown(wait=False)
+
+    def _run_code_agents(self, mcp: "MCP", ctx: ExecutionContext, details: Dict[str, Any]) -> "OrchestrationResult | None":
+        """Run the code-generation step: unified single-file or per-module fan-out."""
+        # Determine code generation strategy based on MCU hardware
+        target_mcu = self.payload.get("target_mcu", "").lower()
+        mcu_format = CodeAgent.determine_mcu_format(target_mcu)
+        framework = mcu_format["framework"]
+        modules = self.payload.get("modules", [])
+        factory = self.agent_factories.get("code_agent", CodeAgent)
+
+        if mcu_format["is_single_file"]:
+            # Single-file firmware (Arduino, ESP32-Arduino, RP2040, etc.)
+            logger.info(f"Single-file MCU detected ({framework}): generating unified firmware file")
+            project_name = self.payload.get("project_name", "firmware")
+            # Pass ALL modules and hardware context
+            unified_input = {
+                "id": project_name.replace(" ", "_"),
+                "name": project_name,
+                "type": "unified",
+                "target_mcu": self.payload.get("target_mcu"),
+                "modules": modules,
+                "all_modules": modules,
+                "project_name": project_name
+            }
+            return self._invoke(mcp, factory("unified_firmware"), ctx, unified_input, details)
+
+        # Modular firmware (STM32, nRF52, PIC32, etc.)
+        logger.info(f"Modular MCU detected ({framework}): generating per-module code")
+        module_jobs = []
+        for mod in modules:
+            module_id = mod.get("id")
+            if not module_id:
+                logger.warning("Module missing 'id' field, skipping: %s", mod)
+                continue
+            module_jobs.append((factory(module_id), mod))
+
+        def _run_module(job):
+            agent, mod = job
+            mcp.check_run(agent.agent_id)
+            return agent, agent.execute(ctx, mod)
+
+        try:
+            # Modules are independent. When the stock CodeAgent runs against
+            # a backend with native batching, one execute_batch call replaces
+            # the N generate round-trips; otherwise the (mostly LLM-latency-
+            # bound) agents run in a bounded pool, and a single module keeps
+            # the plain call path. Injected test factories never batch.
+            if (factory is CodeAgent and len(module_jobs) > 1
+                    and hasattr(ctx.llm, "generate_batch")):
+                for agent, _ in module_jobs:
+                    mcp.check_run(agent.agent_id)
+                batch_results = CodeAgent.execute_batch(ctx, [mod for _, mod in module_jobs])
+                results = [(agent, res) for (agent, _), res in zip(module_jobs, batch_results)]
+            elif len(module_jobs) > 1:
+                with ThreadPoolExecutor(max_workers=min(_MODULE_CONCURRENCY, len(module_jobs))) as pool:
+                    results = list(pool.map(_run_module, module_jobs))
+            else:
+                results = [_run_module(job) for job in module_jobs]
+            for agent, res in results:
+                details[agent.agent_id] = res
+                if not res.success:
+                    return OrchestrationResult(success=False, message=f"{agent.agent_id} failed: {res.message}", details=details)
+        except MCPViolation as mv:
+            logger.error("MCP violation during code agents: %s", mv)
+            return OrchestrationResult(success=False, message=str(mv), details=details)
+        return None
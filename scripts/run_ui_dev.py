@@ -4,6 +4,8 @@ Simple development server launcher for CyberForge-26 UI
 Launches both backend API and frontend dev server
 """
 
+import signal
+import socket
 import subprocess
 import sys
 import time
@@ -11,16 +13,28 @@ import os
 from pathlib import Path
 
 def run_command(cmd, shell=False, cwd=None):
-    """Run a command and return the process"""
+    """Run a command and return the process.
+
+    Child stdio is inherited from this process: piping it without a reader
+    fills the pipe buffers and deadlocks the servers once they log enough.
+    """
     print(f"Running: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
     return subprocess.Popen(
         cmd,
         shell=shell,
-        cwd=cwd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+        cwd=cwd
     )
 
+def wait_for_port(host, port, attempts=50):
+    """Poll until the port accepts connections (~5s budget); True on success."""
+    for _ in range(attempts):
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
 def main():
     root = Path(__file__).parent
     backend_api = root / "backend_api" / "main.py"
@@ -46,8 +60,10 @@ def main():
         cwd=root
     )
 
-    # Wait for backend to start
-    time.sleep(3)
+    # Proceed as soon as the backend is actually accepting connections
+    # instead of a fixed pessimistic sleep
+    if not wait_for_port("localhost", 8000):
+        print("Warning: backend not reachable on :8000 yet; continuing anyway")
 
     # Start frontend
     print("[2/2] Starting React frontend on http://localhost:3000")
@@ -68,13 +84,26 @@ def main():
     print("=" * 60 + "\n")
 
     try:
-        while True:
-            time.sleep(1)
-            # Check if processes are still running
+        if hasattr(signal, "SIGCHLD"):
+            # Sleep until a child exits (SIGCHLD wakes pause()) instead of
+            # waking up once per second to poll
+            signal.signal(signal.SIGCHLD, lambda *_: None)
+            while backend_proc.poll() is None and frontend_proc.poll() is None:
+                signal.pause()
             if backend_proc.poll() is not None:
                 print("Backend process exited!")
             if frontend_proc.poll() is not None:
                 print("Frontend process exited!")
+            while True:
+                signal.pause()
+        else:
+            # Windows has no SIGCHLD; fall back to coarse polling
+            while True:
+                time.sleep(1)
+                if backend_proc.poll() is not None:
+                    print("Backend process exited!")
+                if frontend_proc.poll() is not None:
+                    print("Frontend process exited!")
     except KeyboardInterrupt:
         print("\n\nShutting down...")
         backend_proc.terminate()
@@ -7,9 +7,26 @@ Checks that all required files were created successfully
 import os
 from pathlib import Path
 
+# One scandir per directory instead of one stat per checked file; the
+# checks cluster in a handful of directories, so this collapses ~30
+# syscalls into ~10 (noticeable on network mounts)
+_dir_names_cache: dict = {}
+
+def _dir_names(parent: Path) -> set:
+    """Set of entry names in parent, read once per directory."""
+    names = _dir_names_cache.get(parent)
+    if names is None:
+        try:
+            with os.scandir(parent) as entries:
+                names = {entry.name for entry in entries}
+        except OSError:
+            names = set()
+        _dir_names_cache[parent] = names
+    return names
+
 def check_file(path: Path, description: str) -> bool:
     """Check if a file exists"""
-    exists = path.exists()
+    exists = path.name in _dir_names(path.parent)
     status = "✓" if exists else "✗"
     print(f"  {status} {description}")
     return exists
@@ -0,0 +1,41 @@
+import pytest
+
+from core.orchestration.orchestrator import Orchestrator
+
+# Canonical single-module payload used by several orchestrator tests; the
+# inner structures are allocated once, copies are handed out per use in
+# case the pipeline mutates module dicts
+_BASE_PAYLOAD = {"system_id": "test", "modules": ({"id": "mod1"},)}
+
+
+def make_payload():
+    return {**_BASE_PAYLOAD, "modules": [dict(m) for m in _BASE_PAYLOAD["modules"]]}
+
+
+@pytest.fixture
+def base_payload():
+    return make_payload()
+
+
+@pytest.fixture(scope="module")
+def module_tmp_path(tmp_path_factory, request):
+    """One temp dir per test module instead of per test.
+
+    Tests that don't collide carve out subdirs by node name, skipping the
+    per-test mkdir/teardown churn of function-scoped tmp_path.
+    """
+    return tmp_path_factory.mktemp(request.module.__name__)
+
+
+@pytest.fixture(scope="session")
+def default_orch_run(tmp_path_factory):
+    """One default-permission orchestrator run shared by read-only tests.
+
+    Running the full pipeline does identical filesystem writes, hashing and
+    MCP audit work every time; tests that only inspect the result or the
+    output tree share this single run. Tests that inject custom permissions
+    or agent factories build their own Orchestrator.
+    """
+    out_dir = tmp_path_factory.mktemp("orch")
+    res = Orchestrator(make_payload(), output_dir=str(out_dir)).run()
+    return out_dir, res
@@ -1,6 +1,8 @@
 from types import SimpleNamespace
 from pathlib import Path
 
+import pytest
+
 from core.mcp.mcp import MCP
 from core.ai.gemini_wrapper import MockGemini
 from core.ai.prompt import PromptLoader
@@ -12,16 +14,22 @@ from agents.test_agent import TestAgent
 PROJECT_ROOT = Path(__file__).parent.parent
 
 
-def make_context(tmp_path: Path):
+@pytest.fixture(scope="module")
+def prompt_loader():
+    # Template reads hit the disk once per module, not once per test;
+    # the loader itself is stateless apart from its cache
+    return PromptLoader(PROJECT_ROOT / "prompts")
+
+
+def make_context(tmp_path: Path, prompt_loader: PromptLoader):
     mcp = MCP(audit_log=tmp_path / "audit.log")
     llm = MockGemini()
-    prompt_loader = PromptLoader(PROJECT_ROOT / "prompts")
     rag = SimpleNamespace(query=lambda q, top_k=3: ["doc1 snippet", "doc2 snippet"])  # lightweight stub
     return SimpleNamespace(mcp=mcp, rag=rag, llm=llm, prompt_loader=prompt_loader, output_dir=str(tmp_path))
 
 
-def test_architecture_agent_uses_llm_and_respects_mcp(tmp_path: Path):
-    ctx = make_context(tmp_path)
+def test_architecture_agent_uses_llm_and_respects_mcp(tmp_path: Path, prompt_loader):
+    ctx = make_context(tmp_path, prompt_loader)
     agent = ArchitectureAgent()
 
     res = agent.execute(ctx, {"system_id": "s1"})
@@ -33,8 +41,8 @@ def test_architecture_agent_uses_llm_and_respects_mcp(tmp_path: Path):
     assert "GENERATED (mock)" in content
 
 
-def test_code_agent_generates_per_module(tmp_path: Path):
-    ctx = make_context(tmp_path)
+def test_code_agent_generates_per_module(tmp_path: Path, prompt_loader):
+    ctx = make_context(tmp_path, prompt_loader)
     agent = CodeAgent("mod1")
 
     res = agent.execute(ctx, {"id": "mod1", "responsibility": "foo"})
@@ -44,8 +52,8 @@ def test_code_agent_generates_per_module(tmp_path: Path):
     assert "GENERATED (mock)" in content
 
 
-def test_test_agent_reads_code_and_uses_llm(tmp_path: Path):
-    ctx = make_context(tmp_path)
+def test_test_agent_reads_code_and_uses_llm(tmp_path: Path, prompt_loader):
+    ctx = make_context(tmp_path, prompt_loader)
     # give permissions to read module_code so test_agent can run normally
     agent = TestAgent()
     res = agent.execute(ctx, {"id": "mod1"})
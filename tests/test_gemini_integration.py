@@ -1,12 +1,26 @@
 import os
 import pytest
 
-from core.ai.gemini_wrapper import GeminiClient
+# Excluded from default collection (see addopts in pyproject.toml); CI jobs
+# that exercise the real API select it with `-m external`
+pytestmark = pytest.mark.external
 
+_REAL_GEMINI_ENABLED = (
+    os.environ.get("USE_REAL_GEMINI") in ("1", "true", "True")
+    and os.environ.get("GEMINI_API_KEY")
+)
 
-@pytest.mark.skipif(not (os.environ.get("USE_REAL_GEMINI") in ("1", "true", "True") and os.environ.get("GEMINI_API_KEY")), reason="Real Gemini not enabled or API key missing")
-def test_gemini_integration_smoke():
-    client = GeminiClient()
-    resp = client.generate("Say hello in two words")
+
+@pytest.fixture(scope="session")
+def gemini_client():
+    # Imported lazily so the (credential-probing) client module is never
+    # loaded in the common skip path; one client serves the whole session
+    from core.ai.gemini_wrapper import GeminiClient
+    return GeminiClient()
+
+
+@pytest.mark.skipif(not _REAL_GEMINI_ENABLED, reason="Real Gemini not enabled or API key missing")
+def test_gemini_integration_smoke(gemini_client):
+    resp = gemini_client.generate("Say hello in two words")
     assert isinstance(resp, str)
     assert len(resp) > 0
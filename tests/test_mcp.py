@@ -1,11 +1,21 @@
 from pathlib import Path
 
+import pytest
+
 from core.mcp.mcp import MCP, MCPViolation
 
 
-def test_mcp_authorize_and_audit(tmp_path: Path):
-    audit_path = tmp_path / "mcp_audit.log"
-    m = MCP(audit_log=audit_path)
+@pytest.fixture(scope="module")
+def mcp_inst(tmp_path_factory):
+    # One MCP (and one open audit handle) shared by the read-only
+    # authorization tests; the raises-test builds its own instance so the
+    # denial entry does not pollute this audit log
+    return MCP(audit_log=tmp_path_factory.mktemp("mcp") / "audit.log")
+
+
+def test_mcp_authorize_and_audit(mcp_inst):
+    m = mcp_inst
+    audit_path = m.audit_log
 
     # architecture_agent should be allowed to write architecture
     assert m.authorize("architecture_agent", "write", "architecture")
@@ -26,8 +36,5 @@ def test_mcp_authorize_and_audit(tmp_path: Path):
 def test_check_write_raises(tmp_path: Path):
     m = MCP(audit_log=tmp_path / "audit.log")
     # This should raise for disallowed resource
-    try:
+    with pytest.raises(MCPViolation, match="not allowed to write architecture"):
         m.check_write("code_agent:mod1", "architecture")
-        assert False, "MCPViolation expected"
-    except MCPViolation:
-        assert True
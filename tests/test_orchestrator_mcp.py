@@ -8,17 +8,15 @@ class MaliciousCodeAgent:
 
     def execute(self, context, inputs: dict):
         # Attempt to write architecture (not allowed for code agents)
-        context.mcp.check_write(self.agent_id, "architecture")
+        aid = self.agent_id
+        context.mcp.check_write(aid, "architecture")
         return True
 
 
-def test_orchestrator_blocks_unauthorized_write():
-    # Prepare payload with one module
-    payload = {"system_id": "test", "modules": [{"id": "mod1"}]}
-
+def test_orchestrator_blocks_unauthorized_write(base_payload):
     # Inject malicious factory for code_agent
     factories = {"code_agent": MaliciousCodeAgent}
-    orch = Orchestrator(payload, agent_factories=factories)
+    orch = Orchestrator(base_payload, agent_factories=factories)
     res = orch.run()
 
     assert not res.success
@@ -1,8 +1,3 @@
-from core.orchestration.orchestrator import Orchestrator
-
-
-def test_orchestrator_topo_sort_runs():
-    inp = {"system_id": "smoke"}
-    orch = Orchestrator(inp)
-    res = orch.run()
+def test_orchestrator_topo_sort_runs(default_orch_run):
+    _, res = default_orch_run
     assert res.success